@@ -8,6 +8,7 @@ import Change
 import Crown_Decomposition
 import Sunflower
 from Hitting_Set import HittingSet
+from Rule_Stats import RuleStats
 
 
 def experiment(v, e, d, k, times):
@@ -16,7 +17,11 @@ def experiment(v, e, d, k, times):
         h_crown2 = copy.deepcopy(h_crown)
         # Crown decomposition
         # reduction = Crown_Decomposition.crown_decomposition_kernel(h_crown)
-        reduction2 = Change.crown_decomposition_kernel(h_crown2)
+        stats = RuleStats()
+        reduction2 = Change.crown_decomposition_kernel(h_crown2, stats)
+        for level in stats.levels:
+            print("high occurrence level", level["i"], ":", level)
+        stats.print_stats()
         if reduction2 is not None:
             print(h_crown.solve(reduction2))
         else:
@@ -1,54 +1,278 @@
-import copy
-import numpy as np
+import argparse
+import csv
+import gc
+import json
+import sys
 import timeit
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
 import Crown_Decomposition
 import Sunflower
-from Hitting_Set import HittingSet
-
-
-def experiment(v, e, d, k, times):
-    # 0 - time ker  1 - time of solve  2 -edges after ker   3 - solution
-    results_crown = np.zeros((2, times))
-    edges_crown = [0]*times
-    solutions_crown = [""]*times
-    results_sunflower = np.zeros((2, times))
-    edges_sunflower = [0] * times
-    solutions_sunflower = [""] * times
-    for i in range(times):
-        h_crown = HittingSet(v, e, d, k)
-        h_sun = copy.deepcopy(h_crown)
-        # Crown decomposition
-        start = timeit.default_timer()
-        reduction = Crown_Decomposition.crown_decomposition_kernel(h_crown)
-        results_crown[0][i] = (timeit.default_timer() - start)
-        edges_crown[i] = h_crown.edges
-        if reduction is not None:
-            start = timeit.default_timer()
-            solutions_crown[i] = h_crown.solve(reduction)
-            results_crown[1][i] = (timeit.default_timer() - start)
-        else:
-            results_crown[1][i] = 0
-            solutions_crown[i] = None
-        # Sunflower lemma
+from Instance_Generator import generate
+
+
+"""
+Benchmark of the kernelizations:
+    a grid of (v, e, d, k), every arm (kernelization) runs on the same instances - repetition r of every
+    configuration is the instance generated with seed + r, so two runs of the benchmark see the same inputs.
+    The first warmup runs of every arm are not measured. The kernel and the solve of the kernel are timed
+    separately, and their median and percentiles over the repetitions are reported, with the reduction
+    ratios (edges and vertices after the kernel / before it) and the peak memory of the kernel + solve
+    (tracemalloc, in a run of its own so it does not slow down the timed ones).
+    The results are written as JSON (the summary and every run) or CSV (the summary), and a stored JSON
+    is a baseline: compare lists the configurations that became slower, bigger or heavier than it.
+"""
+
+"""
+Parallel runs:
+    with workers > 1 every run (an arm on the instance of one seed, and the peak memory runs) is a task of
+    a process pool - the repetitions and the arms of all the configurations run together on all the cores.
+    Every worker makes its warmup runs once, when it starts. The runs are collected as they complete,
+    and the summary of a configuration and arm is made as soon as its last run is back.
+    solve_timeout - the seconds the solve of a run may take: the solve gets a Deadline as the stop event
+    of the search, so it leaves the search once the time is over. Such a run is counted in timed_out and
+    not in the times. Only the solve has a deadline - the kernel always runs to the end (a worker of the
+    pool cannot be stopped in the middle of a task).
+"""
+
+
+def sunflower_linear(h):
+    return Sunflower.sunflowerAlgorithm(h, linear=True)
+
+
+arms = {
+    "crown": Crown_Decomposition.crown_decomposition_kernel,
+    "sunflower": Sunflower.sunflowerAlgorithm,
+    "sunflower_linear": sunflower_linear,
+}
+
+
+def size_of(h):
+    # (edges, vertices that are in an edge)
+    rows = h.e_vertices[h.live_edges()]
+    used = np.arange(rows.shape[1]) < h.e_degree[h.live_edges()][:, None]
+    return h.edges, len(np.unique(rows[used]))
+
+
+class Deadline:
+    # the stop event of the search (HittingSet.stop) - set once the time is over
+
+    def __init__(self, seconds):
+        self.end = timeit.default_timer() + seconds
+
+    def is_set(self):
+        return timeit.default_timer() > self.end
+
+
+def run_once(arm, v, e, d, k, seed, kind="uniform", solve=True, memory=False, solve_timeout=None):
+    # one run of the arm on the instance of seed - a record of the run
+    (h, planted) = generate(v, e, d, k, kind, seed)
+    (edges_before, vertices_before) = size_of(h)
+    gc.collect()
+    if memory:
+        tracemalloc.start()
+    start = timeit.default_timer()
+    reduction = arms[arm](h)
+    kernel_time = timeit.default_timer() - start
+    (edges_after, vertices_after) = size_of(h)
+    solution = None
+    solve_time = 0.0
+    timed_out = False
+    if solve and reduction is not None:
+        deadline = Deadline(solve_timeout) if solve_timeout is not None else None
+        h.stop = deadline
         start = timeit.default_timer()
-        reduction = Sunflower.sunflowerAlgorithm(h_sun)
-        results_sunflower[0][i] = (timeit.default_timer() - start)
-        edges_sunflower[i] = h_sun.edges
-        if reduction is not None:
-            start = timeit.default_timer()
-            solutions_sunflower[i] = h_sun.solve(reduction)
-            results_sunflower[1][i] = (timeit.default_timer() - start)
+        solution = h.solve(reduction)
+        solve_time = timeit.default_timer() - start
+        timed_out = solution is None and deadline is not None and deadline.is_set()
+    peak = 0
+    if memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return {"arm": arm, "v": v, "e": e, "d": d, "k": k, "seed": seed,
+            "kernel_time": kernel_time, "solve_time": solve_time,
+            "edges_before": edges_before, "edges_after": edges_after,
+            "vertices_before": vertices_before, "vertices_after": vertices_after,
+            "no_solution": not timed_out and (reduction is None or (solve and solution is None)),
+            "timed_out": timed_out, "peak_memory": peak}
+
+
+def ratio(after, before):
+    return after / before if before > 0 else 1.0
+
+
+def summarize(runs, percentiles):
+    # one record for the runs of one arm on one configuration (the times only of the runs that finished)
+    first = runs[0]
+    record = {"arm": first["arm"], "v": first["v"], "e": first["e"], "d": first["d"], "k": first["k"],
+              "repetitions": len(runs)}
+    finished = [r for r in runs if not r["timed_out"]]
+    for name in ("kernel_time", "solve_time"):
+        values = [r[name] for r in finished]
+        for p in percentiles:
+            record["%s_p%d" % (name, p)] = float(np.percentile(values, p)) if len(values) > 0 else float("nan")
+    record["edge_ratio"] = float(np.median([ratio(r["edges_after"], r["edges_before"]) for r in runs]))
+    record["vertex_ratio"] = float(np.median([ratio(r["vertices_after"], r["vertices_before"]) for r in runs]))
+    record["edges_after"] = float(np.median([r["edges_after"] for r in runs]))
+    record["no_solution"] = sum(r["no_solution"] for r in runs)
+    record["timed_out"] = len(runs) - len(finished)
+    return record
+
+
+def warm_worker(v, e, d, k, arm_names, warmup, seed, kind, solve):
+    # the warmup runs of a worker process, on the first configuration
+    for arm in arm_names:
+        for i in range(warmup):
+            run_once(arm, v, e, d, k, seed, kind, solve)
+
+
+def experiment(grid, arm_names=None, repetitions=5, warmup=1, seed=0, kind="uniform", solve=True,
+               memory=True, percentiles=(10, 50, 90), workers=1, solve_timeout=None, progress=None):
+    # grid - (v, e, d, k) tuples. returns (a summary record for every configuration and arm, every run)
+    # workers - more than 1: the runs are tasks of a process pool. progress - if given, called with every
+    # summary record as soon as it is made
+    if arm_names is None:
+        arm_names = list(arms)
+    if 50 not in percentiles:
+        percentiles = tuple(percentiles) + (50,)  # compare uses the medians
+    groups = [(arm, tuple(config)) for config in grid for arm in arm_names]
+    # the tasks of every group - (group, arguments of run_once), the memory run last
+    tasks = []
+    for g, (arm, config) in enumerate(groups):
+        for r in range(repetitions):
+            tasks.append((g, (arm,) + config + (seed + r, kind, solve, False, solve_timeout)))
+        if memory:
+            tasks.append((g, (arm,) + config + (seed, kind, solve, True, solve_timeout)))
+    measured = [[] for g in groups]
+    left = [0] * len(groups)
+    for (g, args) in tasks:
+        left[g] += 1
+    peaks = [0] * len(groups)
+    records = [None] * len(groups)
+    runs = []
+
+    def collect(g, memory_run, run):
+        # a run is back - the summary of its group once it is the last one
+        if memory_run:
+            peaks[g] = run["peak_memory"]
         else:
-            results_sunflower[1][i] = 0
-            solutions_sunflower[i] = None
-    print("Results:\n [time ker,time of solve,edges after ker,solution]*times")
-    print("Crown Decomposition:\n", results_crown)
-    print(edges_crown)
-    print(solutions_crown)
-    print("Sunflower Lemma:\n", results_sunflower)
-    print(edges_sunflower)
-    print(solutions_sunflower)
-
-# run the experiment:
-# Input :  S   C   d  k  times
-experiment(20, 10, 3, 4, 1)
+            measured[g].append(run)
+            runs.append(run)
+        left[g] -= 1
+        if left[g] == 0:
+            records[g] = summarize(measured[g], percentiles)
+            records[g]["peak_memory"] = peaks[g]
+            if progress is not None:
+                progress(records[g])
+
+    if workers > 1:
+        (v, e, d, k) = groups[0][1]
+        with ProcessPoolExecutor(workers, initializer=warm_worker,
+                                 initargs=(v, e, d, k, arm_names, warmup, seed, kind, solve)) as pool:
+            # args[8] - the memory flag of run_once
+            futures = {pool.submit(run_once, *args): (g, args[8]) for (g, args) in tasks}
+            for f in as_completed(futures):
+                (g, memory_run) = futures[f]
+                collect(g, memory_run, f.result())
+    else:
+        warmed = set()
+        for (g, args) in tasks:
+            if g not in warmed:
+                warmed.add(g)
+                (arm, config) = groups[g]
+                for i in range(warmup):
+                    run_once(arm, *config, seed, kind, solve)
+            collect(g, args[8], run_once(*args))
+    return records, runs
+
+
+def compare(summary, baseline, tolerance=0.2, min_time=1e-3):
+    # the regressions of summary against the baseline summary: a median time or the peak memory that grew
+    # by more than tolerance (and the time by more than min_time seconds), or a larger kernel
+    old = {(r["arm"], r["v"], r["e"], r["d"], r["k"]): r for r in baseline}
+    regressions = []
+    for record in summary:
+        base = old.get((record["arm"], record["v"], record["e"], record["d"], record["k"]))
+        if base is None:
+            continue
+        worse = []
+        for name in ("kernel_time_p50", "solve_time_p50"):
+            if record[name] > base[name] * (1 + tolerance) and record[name] - base[name] > min_time:
+                worse.append(name)
+        if base["peak_memory"] > 0 and record["peak_memory"] > base["peak_memory"] * (1 + tolerance):
+            worse.append("peak_memory")
+        for name in ("edge_ratio", "vertex_ratio"):
+            if record[name] > base[name] + 1e-9:
+                worse.append(name)
+        for name in worse:
+            regressions.append({"arm": record["arm"], "v": record["v"], "e": record["e"], "d": record["d"],
+                                "k": record["k"], "metric": name, "baseline": base[name], "current": record[name]})
+    return regressions
+
+
+def write_json(path, summary, runs):
+    with open(path, "w") as f:
+        json.dump({"summary": summary, "runs": runs}, f, indent=1)
+
+
+def read_json(path):
+    with open(path) as f:
+        return json.load(f)["summary"]
+
+
+def write_csv(path, summary):
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(summary[0]))
+        writer.writeheader()
+        writer.writerows(summary)
+
+
+def print_summary(summary):
+    print("%-17s %24s %12s %12s %12s %8s %8s %12s" % ("arm", "(v, e, d, k)", "kernel p50", "kernel p90",
+                                                     "solve p50", "edges", "vertices", "peak KiB"))
+    for r in summary:
+        print("%-17s %24s %12.6f %12.6f %12.6f %8.3f %8.3f %12.1f" % (
+            r["arm"], str((r["v"], r["e"], r["d"], r["k"])), r["kernel_time_p50"], r["kernel_time_p90"],
+            r["solve_time_p50"], r["edge_ratio"], r["vertex_ratio"], r["peak_memory"] / 1024))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="benchmark of the d-Hitting Set kernelizations")
+    parser.add_argument("--grid", action="append", metavar="V,E,D,K",
+                        help="a configuration (can be given more than once), default 20,10,3,4")
+    parser.add_argument("--arms", nargs="+", choices=list(arms), default=list(arms))
+    parser.add_argument("--repetitions", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--kind", default="uniform", help="the kind of the instances (Instance_Generator)")
+    parser.add_argument("--no-solve", action="store_true", help="only the kernels")
+    parser.add_argument("--no-memory", action="store_true", help="skip the peak memory run")
+    parser.add_argument("--json", help="write the summary and the runs to this file")
+    parser.add_argument("--csv", help="write the summary to this file")
+    parser.add_argument("--baseline", help="a JSON of an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--workers", type=int, default=1, help="processes that run the repetitions and arms")
+    parser.add_argument("--solve-timeout", type=float,
+                        help="seconds for the solve of one run (the kernel is not interrupted)")
+    args = parser.parse_args(argv)
+    grid = [tuple(int(x) for x in g.split(",")) for g in (args.grid or ["20,10,3,4"])]
+    (summary, runs) = experiment(grid, args.arms, args.repetitions, args.warmup, args.seed, args.kind,
+                                 not args.no_solve, not args.no_memory, workers=args.workers,
+                                 solve_timeout=args.solve_timeout)
+    print_summary(summary)
+    if args.json:
+        write_json(args.json, summary, runs)
+    if args.csv:
+        write_csv(args.csv, summary)
+    if args.baseline:
+        regressions = compare(summary, read_json(args.baseline), args.tolerance)
+        for r in regressions:
+            print("regression: %s %s %s %s -> %s" % (r["arm"], (r["v"], r["e"], r["d"], r["k"]), r["metric"],
+                                                    r["baseline"], r["current"]))
+        return 1 if len(regressions) > 0 else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
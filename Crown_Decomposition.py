@@ -1,6 +1,7 @@
-import copy
 import numpy as np
+from collections import Counter, deque
 from itertools import combinations
+from Rule_Stats import run_rule
 
 
 """
@@ -11,83 +12,93 @@ are used by previously known dHS kernelization algorithms.
 """
 
 
-def subset_vertex(h, v1, v2):
-    for e in range(h.edges):
-        if (h.matrix[v1][e] == 1) and (h.matrix[v2][e] == 0):
-            return False
-    return True
-
-
 def check_vertex(h, v1):
-    for v2 in range(h.vertices - 1, -1, -1):
-        if (h.v_degree[v2] != 0) and (v2 != v1):
-            if subset_vertex(h, v1, v2):
-                return True
+    # only a vertex that shares an edge with v1 can dominate it - count |E(v1) ∩ E(v2)|
+    # over the edges of v1, then E(v1) ⊆ E(v2) iff the count of v2 is |E(v1)|
+    count = Counter()
+    for e in h.v_edges[v1]:
+        count.update(h.edge(e).tolist())
+    degree = len(h.v_edges[v1])
+    for v2, together in count.items():
+        if (together == degree) and (h.v_degree[v2] != 0) and (v2 != v1):
+            return True
     return False
 
 
-def vertex_domination_rule(h):
+def vertex_domination_rule(h, stats=None):
     # If x,y ∈ S are such that E(x) ⊂ E(y),then delete x.
     # print("*vertex_domination_rule*")
     change = 0
+    checked = 0
     for v in range(h.vertices - 1, -1, -1):
         if h.v_degree[v] != 0:
+            checked += 1
             if check_vertex(h, v):
                 h.delete_vertex(v)
                 change = 1
+    if stats is not None:
+        stats.count(checked)
     return change
 
 
-def subset_edge(h, e1, e2):
-    if h.e_degree[e1] == h.e_degree[e2]:
-        return False
-    for v in range(h.vertices):
-        if (h.matrix[v][e1] == 1) and (h.matrix[v][e2] == 0):
-            return False
-    return True
-
-
-def is_dup(h, e1, e2):
-    edge_e1 = h.matrix[:, e1]
-    edge_e2 = h.matrix[:, e2]
-    if sum(np.bitwise_xor(edge_e1,edge_e2)) == 0:
-        return True
-    return False
+def supersets(h, e1):
+    # the edges that contain e1 properly: the intersection of the edge lists of its vertices
+    return [e2 for e2 in edges_containing(h, h.edge(e1).tolist()) if h.e_degree[e2] > h.e_degree[e1]]
 
 
 def check_edge(h, e1):
-    for e2 in range(h.edges - 1, -1, -1):
-        if e2 is not e1:
-            if is_dup(h, e1, e2):
-                return True
-            if subset_edge(h, e2, e1):
-                return True
+    # does e1 contain another edge properly? apart from an empty edge, such an edge shares
+    # all of its vertices with e1 - count them over the edge lists of the vertices of e1
+    if (h.e_degree[e1] > 0) and (() in h.e_index):
+        return True
+    count = Counter()
+    for v in h.edge(e1).tolist():
+        count.update(h.v_edges[v])
+    for e2, shared in count.items():
+        if (shared == h.e_degree[e2]) and (h.e_degree[e2] < h.e_degree[e1]):
+            return True
     return False
 
 
-def edge_domination_rule(h):
+def edge_domination_rule(h, stats=None):
     # If e1,e2 ∈ C are such that V({e1}) ⊂ V({e2}) then delete e2
     # print("*edge_domination_rule*")
+    # after a pass no edge dominates another, so only the edges that were added or shrunk
+    # since the last pass (h.changed_edges) can take part in a new domination
     change = 0
-    for e in range(h.edges-1, -1, -1):
-        if check_edge(h, e):
-            h.delete_edge(e)
+    changed = h.changed_edges
+    h.changed_edges = set()
+    if stats is not None:
+        stats.count(len(changed))
+    # equal edges - keep the first one, found by the edge index
+    if h.remove_duplicates(edges=changed) > 0:
+        change = 1
+    changed = sorted(changed, key=lambda e: h.e_degree[e])
+    for e1 in changed:
+        if h.alive[e1]:
+            for e2 in supersets(h, e1):
+                h.delete_edge(e2)
+                change = 1
+    for e1 in changed:
+        if h.alive[e1] and check_edge(h, e1):
+            h.delete_edge(e1)
             change = 1
     return change
 
 
 def get_vertex(h, e):
-    for v in range(h.vertices):
-        if h.matrix[v][e] == 1:
-            return v
+    if h.e_degree[e] > 0:
+        return int(h.edge(e)[0])
     return -1
 
 
-def singleton(h):
+def singleton(h, stats=None):
     # print("*singleton*")
     s = []
-    for e in range(h.edges-1, -1, -1):
+    for e in reversed(h.live_edges()):
         if h.e_degree[e] == 1:
+            if stats is not None:
+                stats.count(1)
             v = get_vertex(h, e)
             if v != -1:
                 if v not in s:
@@ -109,42 +120,46 @@ is reduced. This could be the result of applying the rule iteratively until it c
 """
 
 
-def convert_edge(h, e):
-    converted_e = np.array([0] * h.vertices)
-    for v in e:
-        converted_e[v] = 1
-    return converted_e
+def edges_containing(h, e):
+    # the edges of C that contain the subedge e
+    if len(e) == 0:
+        return set(h.live_edges())
+    return set.intersection(*[h.v_edges[v] for v in e])
 
 
 def check_group(h, edges, e_checked):
     for e in edges:
-        e_group = h.matrix[:, e]
-        if sum(np.bitwise_and(e_group, e_checked)) != (h.d - 2):
+        if h.intersection_size(e, e_checked) != (h.d - 2):
             return False
     return True
 
 
 def intersection(h, option):
     edges = []
-    e_option = convert_edge(h, option)
-    for e in range(h.edges):
-        e_checked = h.matrix[:, e]
-        if sum(np.bitwise_and(e_option, e_checked)) == (h.d - 2):
-            if check_group(h, edges, e_checked):
-                edges.insert(0,e)
+    for e in sorted(edges_containing(h, option)):
+        if check_group(h, edges, e):
+            edges.insert(0,e)
     if len(edges) > h.k:
         for e in edges:
             h.delete_edge(e)
-        h.add_edge(e_option)
+        h.add_edge(option)
         return 1
     return 0
 
 
-def high_degree_rule(h):
+def high_degree_rule(h, stats=None):
     # print("*high_degree_rule*")
+    # only a (d − 2)-subedge of more than k edges can be their pair-wise intersection - count the
+    # (d − 2)-subedges of all the edges in one pass and check just those, in the same (lexicographic) order.
+    # applying the rule only deletes edges, so a later subedge cannot gain occurrences
     change = 0
-    combination = list(combinations(range(h.vertices), (h.d - 2)))
-    for e in combination:
+    count = Counter()
+    for e in h.live_edges():
+        count.update(combinations(h.edge(e).tolist(), (h.d - 2)))
+    candidates = sorted(e for e in count if count[e] > h.k)
+    if stats is not None:
+        stats.count(len(candidates))
+    for e in candidates:
         check = intersection(h, e)
         change = check | change
     return change
@@ -157,27 +172,13 @@ Weakly related:
 """
 
 
-def is_not_subset_edges(e1, e2):
-    num1 = 1
-    num2 = 1
-    different = np.bitwise_xor(e1,e2)
-    for v in range(len(e1)):
-        if different[v] == 1:
-            if e1[v] == 1:
-                num1 = 0
-            elif e2[v] == 1:
-                num2 = 0
-            if num1 == 0 and num2 == 0:
-                return True
-    return False
+def is_not_subset_edges(h, e1, e2):
+    return not h.is_subset(e1, e2) and not h.is_subset(e2, e1)
 
 
 def weakly_related(h, e1, e2):
-    edge_e1 = h.matrix[:, e1]
-    edge_e2 = h.matrix[:, e2]
-    similar = np.bitwise_and(edge_e1, edge_e2)
-    if sum(similar) <= (h.d - 2):
-        if is_not_subset_edges(edge_e1, edge_e2):
+    if h.intersection_size(e1, e2) <= (h.d - 2):
+        if is_not_subset_edges(h, e1, e2):
             return True
     return False
 
@@ -191,23 +192,25 @@ maximal set W  of weakly related edges -
 
 
 def check_union(h, w, e):
-    for e2 in range(h.edges):
+    for e2 in h.live_edges():
         if w[e2] == 1:
             if not weakly_related(h, e, e2):
                 return False
     return True
 
 
-def maximal_set(h):
+def maximal_set(h, stats=None):
     # print("*maximal_set*")
-    w = np.array([0] * h.edges)
-    check = np.array([0] * h.edges)
-    for e in range(h.edges):
+    w = np.array([0] * h.slots)
+    check = np.array([0] * h.slots)
+    for e in h.live_edges():
         if h.e_degree[e] <= (h.d - 2):
             w[e] = 1
         else:
             check[e] = 1
-    for e in range(h.edges):
+    if stats is not None:
+        stats.count(int(check.sum()))
+    for e in h.live_edges():
         if check[e] == 1:
             if check_union(h, w, e):
                 w[e] = 1
@@ -233,34 +236,51 @@ from applying the high-occurrence rule. Then |W |<= k^(d−1)
 
 
 def w_e(h, w, e1):
-    ret = copy.deepcopy(w)
-    for v in e1:
-        edges_with_v = h.matrix[v]
-        ret = np.bitwise_and(ret, edges_with_v)
-    return ret
+    # the edges of W that contain e1
+    return {e for e in edges_containing(h, e1) if w[e] == 1}
 
 
-def high_occurrence_rule(h):
-    w = maximal_set(h)
+def high_occurrence_rule(h, stats=None):
+    # stats - a RuleStats, or None. a record of every level i is appended to its levels
+    w = list(run_rule(h, stats, "maximal_set", maximal_set))  # grows with the added subedges
     # print("*high_occurrence_rule*")
-    delete_from_w = [0]*h.edges
+    delete_from_w = [0]*h.slots
     for i in range(h.d - 2, 0, -1):
-        comb = list(combinations(range(h.vertices), i))
-        for e in comb:
-            we = w_e(h, w, e)
-            if sum(we) > pow(h.k, (h.d - 1 - i)):
-                for d_e in range(len(we)):
-                    if we[d_e] == 1:
-                        delete_from_w[d_e] = 1
-                        w[d_e] = 0
-                h.add_edge(convert_edge(h, e))
-                w = np.append(w, [1])
-                delete_from_w = np.append(delete_from_w, [0])
-    for x in range(h.edges - 1, -1, -1):
+        bound = pow(h.k, (h.d - 1 - i))
+        w_edges = [e for e in range(len(w)) if w[e] == 1]
+        level = {"i": i, "bound": bound, "w_size": len(w_edges), "pruned": False, "subedges": 0, "candidates": 0,
+                 "applied": 0}
+        if stats is not None:
+            stats.levels.append(level)
+        if len(w_edges) <= bound:
+            # |We| <= |W| for every e, the rule cannot apply on this level
+            level["pruned"] = True
+            continue
+        # |We| of every i-subedge e of W, counted over the edges of W only
+        count = Counter()
+        for f in w_edges:
+            count.update(combinations(h.edge(f).tolist(), i))
+        level["subedges"] = len(count)
+        # |We| only drops while the level is applied (apart from the new edge e itself)
+        candidates = sorted(e for e in count if count[e] > bound)
+        level["candidates"] = len(candidates)
+        if stats is not None:
+            stats.count(len(candidates))
+        for e in candidates:
+            if count[e] > bound:
+                for d_e in w_e(h, w, e):
+                    delete_from_w[d_e] = 1
+                    w[d_e] = 0
+                    count.subtract(combinations(h.edge(d_e).tolist(), i))
+                h.add_edge(e)
+                w.append(1)
+                delete_from_w.append(0)
+                count[e] += 1
+                level["applied"] += 1
+    for x in range(h.slots - 1, -1, -1):
         if delete_from_w[x] == 1:
             h.delete_edge(x)
-            w = np.delete(w, [x])
-    return w
+    return np.array(w)
 
 
 """
@@ -278,89 +298,84 @@ The rest of the work is identical to the crown construction and reduction that w
 
 
 def v_in_w(h, w, v):
-    edges_with_v = h.matrix[v]
-    edges_with_v = np.bitwise_and(edges_with_v, w)
-    if sum(edges_with_v) > 0:
-        return True
+    for e in h.v_edges[v]:
+        if w[e] == 1:
+            return True
     return False
 
 
-def find_neighbors(h, i_arr, e1):
-    neighbors = [0] * h.vertices
-    edge_e1 = h.matrix[:, e1]
-    for e2 in range(h.edges):
-        if h.e_degree[e2] == h.d:
-            edge_e2 = h.matrix[:, e2]
-            if sum(np.bitwise_and(edge_e1, edge_e2)) == (h.d - 1):
-                diff = np.bitwise_xor(edge_e1, edge_e2)
-                np.bitwise_or(neighbors, diff)
-    neighbors = np.bitwise_and(neighbors, i_arr)
+def find_neighbors(h, x, h_index):
+    # the (d − 1)-subedges of W that make an edge with x
+    neighbors = []
+    for e in h.v_edges[x]:
+        sub = tuple(v for v in h.edge(e).tolist() if v != x)
+        if sub in h_index:
+            neighbors.append(h_index[sub])
     return neighbors
 
 
-def get_neighbor(s, e, v_num):
-    for v in range(v_num):
-        if s[e][v] == 1:
-            return v
-    return -1
-
-
-def get_neighbors(s, group, v_num):
-    neighbors = [0] * v_num
-    for e in group:
-        neighbors = np.bitwise_or(neighbors, s[e])
-    return neighbors
-
-
-def array2num(arr):
-    res = []
-    for x in range(arr):
-        if arr[x] == 1:
-            res.append(x)
-    return res
-
-
-def stable(s, group, neighbors):
-    new_z = []
-    new_nz = []
-    for e in group:
-        for v in neighbors:
-            if s[e][v] == 1:
-                new_z.append(e)
-                new_nz.append(v)
-                neighbors.remove(v)
-    return [new_z, new_nz]
-
-
-def hall(h, i_arr, h_arr, s):
-    # print("*hall*")
-    if len(h_arr) == 1:
-        v = get_neighbor(s, h_arr[0], h.vertices)
-        if v != -1:
-            return [v]
-        return []
-    for size in range(1, len(h_arr), 1):
-        comb = list(combinations(h_arr, size))
-        for group in comb:
-            neighbors = get_neighbors(s, group, h.vertices)
-            if sum(neighbors) > 0:
-                neighbors = array2num(neighbors)
-                if len(neighbors) == size:
-                    for z in group:
-                        h_arr.remove(z)
-                    for n_z in neighbors:
-                        i_arr.remove(n_z)
-                    return neighbors.extend(hall(h, i_arr, h_arr, s))
-                if len(neighbors) > size:
-                    s = stable(s, np.asarray(group), neighbors)
-                    for z in s[0]:
-                        h_arr.remove(z)
-                    for n_z in s[1]:
-                        i_arr.remove(n_z)
-                    res = s[1]
-                    res.extend(hall(h, i_arr, h_arr, s))
-                    return res
-    return []
+def hopcroft_karp(adj):
+    # maximum matching of a bipartite graph, adj - a vertex of the left side -> its right side neighbors
+    # every phase finds the shortest augmenting paths (BFS) and augments along them (DFS), O(E*sqrt(V))
+    match_l = {x: None for x in adj}
+    match_r = {}
+    while True:
+        free = [x for x in adj if match_l[x] is None]
+        dist = {x: 0 for x in free}
+        queue = deque(free)
+        found = False
+        while len(queue) > 0:
+            x = queue.popleft()
+            for y in adj[x]:
+                x2 = match_r.get(y)
+                if x2 is None:
+                    found = True
+                elif x2 not in dist:
+                    dist[x2] = dist[x] + 1
+                    queue.append(x2)
+        if not found:
+            return match_l, match_r
+        for x0 in free:
+            # explicit stack - the left vertices of the path, path - the right vertices between them
+            stack = [(x0, iter(adj[x0]))]
+            path = []
+            while len(stack) > 0:
+                (x, neighbors) = stack[-1]
+                y = next(neighbors, None)
+                if y is None:
+                    dist[x] = -1  # a dead end for the rest of the phase
+                    stack.pop()
+                    if len(stack) > 0:
+                        path.pop()
+                    continue
+                x2 = match_r.get(y)
+                if x2 is None:
+                    path.append(y)
+                    for ((x1, _), y1) in zip(stack, path):
+                        match_l[x1] = y1
+                        match_r[y1] = x1
+                    break
+                if dist.get(x2) == dist[x] + 1:
+                    path.append(y)
+                    stack.append((x2, iter(adj[x2])))
+
+
+def crown_of_matching(adj, match_l, match_r):
+    # I' - the left vertices on alternating paths from the unmatched ones, H' = N(I').
+    # every vertex of H' is matched (otherwise the matching was not maximum) and its partner is in I'
+    reached = [x for x in adj if match_l[x] is None]
+    i_crown = set(reached)
+    h_crown = set()
+    while len(reached) > 0:
+        x = reached.pop()
+        for y in adj[x]:
+            if y not in h_crown:
+                h_crown.add(y)
+                x2 = match_r[y]
+                if x2 not in i_crown:
+                    i_crown.add(x2)
+                    reached.append(x2)
+    return sorted(i_crown)
 
 
 def different_arrays(h, e1, e2):
@@ -368,41 +383,41 @@ def different_arrays(h, e1, e2):
         return -1
     if not (h.e_degree[e2] == h.d):
         return -1
-    ret = -1
-    edge_e1 = h.matrix[:, e1]
-    edge_e2 = h.matrix[:, e2]
-    for v in range(h.vertices):
-        n = edge_e1[v] - edge_e2[v]
-        if n == -1:
-            return -1
-        if n == 1:
-            ret = v
-    return ret
-
-
-def construct_crown(h, w):
+    edge_e1 = set(h.edge(e1).tolist())
+    edge_e2 = set(h.edge(e2).tolist())
+    if len(edge_e2 - edge_e1) > 0:
+        return -1
+    return max(edge_e1 - edge_e2, default=-1)
+
+
+def construct_crown(h, w, stats=None):
     # print("*construct_crown*")
-    # based on Expansion lemma (q=1) and Hall's theorem
-    i_arr = [1]*h.vertices
-    h_arr = []
-    s = []
+    # based on Expansion lemma (q=1): a maximum matching of G_(I,H) (Hopcroft-Karp), the crown is
+    # what the alternating paths from the unmatched vertices of I reach
+    # (d − 1)-subedges of W -> their index
+    h_index = {}
+    for e1 in h.live_edges():
+        if (w[e1] == 1) and (h.e_degree[e1] == h.d):
+            for sub in combinations(h.edge(e1).tolist(), h.d - 1):
+                h_index.setdefault(sub, len(h_index))
 
     # complement of V(W) in S
-    for v in range(h.vertices):
-        if v_in_w(h, w, v):
-            i_arr[v] = 0
-
-    # (d − 1)-subedges of W
-    for e1 in range(h.edges):
-        if (w[e1] == 1) and (h.e_degree[e1] == h.d - 1):
-            h_arr.append(e1)
-            s.append(find_neighbors(h, i_arr, e1))
-        else:
-            arr = [0]*h.vertices
-            s.append(arr)
-
-    if len(i_arr) > len(h_arr):
-        return hall(h, i_arr, h_arr, s)
+    i_arr = [v for v in range(h.vertices) if not v_in_w(h, w, v)]
+
+    if stats is not None:
+        stats.crown = {"i": len(i_arr), "h": len(h_index), "crown": 0}
+        stats.count(len(i_arr))
+    if len(i_arr) > len(h_index):
+        adj = {}
+        for x in i_arr:
+            neighbors = find_neighbors(h, x, h_index)
+            if len(neighbors) > 0:
+                adj[x] = neighbors
+        (match_l, match_r) = hopcroft_karp(adj)
+        crown = crown_of_matching(adj, match_l, match_r)
+        if stats is not None:
+            stats.crown["crown"] = len(crown)
+        return crown
     else:
         return None
 
@@ -430,27 +445,28 @@ End
 """
 
 
-def repeat_steps(h, n, reduction):
+def repeat_steps(h, n, reduction, stats=None):
+    # stats - a RuleStats that measures every rule, or None
     change = 1
     if n == 1:
-        vertex_domination_rule(h)
+        run_rule(h, stats, "vertex_domination", vertex_domination_rule)
     if n == 2:
         while change == 1:
-            change = edge_domination_rule(h)
+            change = run_rule(h, stats, "edge_domination", edge_domination_rule)
             if change == 1:
-                change = vertex_domination_rule(h)
+                change = run_rule(h, stats, "vertex_domination", vertex_domination_rule)
     if n == 3:
         while change == 1:
             x = len(reduction)
-            reduction.extend(singleton(h))
+            reduction.extend(run_rule(h, stats, "singleton", singleton))
             if h.k == 0 or h.edges == 0:
                 return
             if len(reduction) > x:
-                change = edge_domination_rule(h)
+                change = run_rule(h, stats, "edge_domination", edge_domination_rule)
                 if change == 1:
-                    vertex_domination_rule(h)
+                    run_rule(h, stats, "vertex_domination", vertex_domination_rule)
                 else:
-                    change = vertex_domination_rule(h)
+                    change = run_rule(h, stats, "vertex_domination", vertex_domination_rule)
             else:
                 change = 0
     if n == 4:
@@ -459,46 +475,53 @@ def repeat_steps(h, n, reduction):
                 return reduction
             if h.k <= 0:
                 return None
-            change = high_degree_rule(h)
+            change = run_rule(h, stats, "high_degree", high_degree_rule)
             if change == 1 and h.k > 0 and h.edges > 0:
                 x = len(reduction)
-                reduction.extend(singleton(h))
+                reduction.extend(run_rule(h, stats, "singleton", singleton))
                 if h.k == 0 or h.edges == 0:
                     return
                 if len(reduction) > x:
-                    change = edge_domination_rule(h)
+                    change = run_rule(h, stats, "edge_domination", edge_domination_rule)
                     if change == 1:
-                        vertex_domination_rule(h)
+                        run_rule(h, stats, "vertex_domination", vertex_domination_rule)
                     else:
-                        change = vertex_domination_rule(h)
+                        change = run_rule(h, stats, "vertex_domination", vertex_domination_rule)
                 else:
                     change = 0
 
 
-def crown_decomposition_kernel(h):
+def crown_decomposition_kernel(h, stats=None):
+    # stats - a Rule_Stats.RuleStats that collects the calls, time and removals of every rule, or None
     reduction = []
-    repeat_steps(h, 1, [])  # vertex_domination_rule
-    repeat_steps(h, 2, [])  # edge_domination_rule + vertex_domination_rule
-    repeat_steps(h, 3, reduction)  # singleton + edge_domination_rule + vertex_domination_rule
+    repeat_steps(h, 1, [], stats)  # vertex_domination_rule
+    repeat_steps(h, 2, [], stats)  # edge_domination_rule + vertex_domination_rule
+    repeat_steps(h, 3, reduction, stats)  # singleton + edge_domination_rule + vertex_domination_rule
     if h.edges == 0 and h.k >= 0:
         return reduction
     if h.k <= 0:
         return None
-    repeat_steps(h, 4, reduction)  # high_degree_rule + singleton + edge_domination_rule + vertex_domination_rule
+    repeat_steps(h, 4, reduction, stats)  # high_degree_rule + singleton + edge_domination_rule + vertex_domination_rule
     if h.edges == 0 and h.k >= 0:
         return reduction
     if h.k <= 0:
         return None
-    w = high_occurrence_rule(h)  # include maximal set
+    w = run_rule(h, stats, "high_occurrence", high_occurrence_rule)  # include maximal set
+    remap = h.compact()  # drop the edges deleted so far
+    w = w[remap != -1]
     if h.edges == 0 and h.k >= 0:
         return reduction
     if h.k <= 0:
         return None
     if sum(w) > pow(h.k, 2):
         return None
-    y = construct_crown(h, w)
+    if stats is not None:
+        mark = stats.begin(h)
+    y = construct_crown(h, w, stats)
     if y is not None:
         for v in y:
             h.delete_vertex(v)
+    if stats is not None:
+        stats.end("crown", h, mark)
     return reduction
 
@@ -1,37 +1,98 @@
-import copy
+import gc
 import numpy as np
 import random
+from Search_Tree import SearchTree
+from Parallel_Search import parallel_solve
+
+
+def pack(vertices):
+    # the bitset of a set of vertices
+    bits = 0
+    for v in vertices:
+        bits |= 1 << int(v)
+    return bits
 
 
 class HittingSet:
 
-    def __init__(self, v, e, d, k):
+    def __init__(self, v, e, d, k, packed=False):
         self.vertices = v
-        self.edges = e
-        self.matrix = np.zeros((v, e), np.int8)
-        self.v_degree = np.array([0] * v)
-        self.e_degree = np.array([0] * e)
+        self.edges = e  # live edges
+        # edge slots in use - deleted edges stay behind as tombstones until compact().
+        # the edge arrays are allocated with spare capacity that doubles when it runs out
+        self.slots = e
+        self.alive = np.ones(e, bool)
+        # edge -> vertices: one sorted row of width d per edge (CSR with a fixed stride), padded with -1
+        self.e_vertices = np.full((e, d), -1, np.int32)
+        # vertex -> edges (CSC), kept in sync with e_vertices
+        self.v_edges = [set() for _ in range(v)]
+        # packed - also keep every edge as a bitset (bit v is set if v ∈ e), so that equality,
+        # subset and intersection size are a few word operations and a popcount
+        self.packed = packed
+        self.e_bits = [0] * e if packed else None
+        # canonical key (sorted vertex tuple) -> the live edges with exactly these vertices
+        self.e_index = {}
+        # edges added or shrunk since the last edge domination pass (all of them at first)
+        self.changed_edges = set(range(e))
+        self.v_degree = np.zeros(v, int)
+        self.e_degree = np.zeros(e, int)
         self.d = d
         self.k = k
+        # a multiprocessing.Event in the workers of a parallel solve - set once one of them found a solution
+        self.stop = None
         self.values()
 
+    def live_edges(self):
+        # the indices of the edges that were not deleted, in order
+        return np.flatnonzero(self.alive[:self.slots]).tolist()
+
+    def key(self, e):
+        # the canonical key of the edge e - equal edges have equal keys
+        return tuple(self.edge(e).tolist())
+
+    def index_edge(self, e):
+        self.e_index.setdefault(self.key(e), set()).add(e)
+
+    def unindex_edge(self, e):
+        key = self.key(e)
+        same = self.e_index[key]
+        same.discard(e)
+        if len(same) == 0:
+            del self.e_index[key]
+
     def edges_with_v(self, v):
         # the set of all edges containing x
-        s = set()
-        for e in range(self.edges):
-            if self.matrix[v][e] == 1:
-                s.add(e)
-        return s
+        return set(self.v_edges[v])
 
     def vertices_of_e(self, edges):
         # for E ⊂ C, V(E) denotes the set of all vertices that are elements of elements of E
         s = set()
         for e in edges:
-            for v in range(self.vertices):
-                if self.matrix[v][e] == 1:
-                    s.add(v)
+            s.update(self.edge(e).tolist())
         return s
 
+    def edge(self, e):
+        # the (sorted) vertices of the edge e
+        return self.e_vertices[e, :self.e_degree[e]]
+
+    def same_edge(self, e1, e2):
+        # V({e1}) = V({e2})
+        if self.packed:
+            return self.e_bits[e1] == self.e_bits[e2]
+        return np.array_equal(self.edge(e1), self.edge(e2))
+
+    def is_subset(self, e1, e2):
+        # V({e1}) ⊆ V({e2})
+        if self.packed:
+            return self.e_bits[e1] & ~self.e_bits[e2] == 0
+        return set(self.edge(e1).tolist()).issubset(self.edge(e2).tolist())
+
+    def intersection_size(self, e1, e2):
+        # |V({e1}) ∩ V({e2})|
+        if self.packed:
+            return (self.e_bits[e1] & self.e_bits[e2]).bit_count()
+        return len(set(self.edge(e1).tolist()).intersection(self.edge(e2).tolist()))
+
     def values(self):
 
         for e in range(self.edges):
@@ -40,106 +101,348 @@ class HittingSet:
             self.e_degree[e] = size
             arr = random.sample(range(0, self.vertices), size)
             print("E", e, " :", arr)
+            self.e_vertices[e, :size] = sorted(arr)
+            if self.packed:
+                self.e_bits[e] = pack(arr)
             for v in arr:
-                self.matrix[v][e] = 1
+                self.v_edges[v].add(e)
                 self.v_degree[v] += 1
+            self.index_edge(e)
+
+    def to_dense(self):
+        # incidence matrix [vertices x edges], O(v·e) - only for printing small instances
+        matrix = np.zeros((self.vertices, self.edges), np.int8)
+        for i, e in enumerate(self.live_edges()):
+            matrix[self.edge(e), i] = 1
+        return matrix
 
     def print_hs(self):
         print("------------Hitting set Input------------")
         print(self.vertices, "vertices and", self.edges, "edges")
         print("vertices degree: ", self.v_degree)
-        print("edges degree: ", self.e_degree)
-        print("incidence matrix [vertices x edges]: \n", self.matrix)
+        print("edges degree: ", self.e_degree[self.live_edges()])
+        print("incidence matrix [vertices x edges]: \n", self.to_dense())
         print("looking for ", self.d, "-Hitting set of size ≤", self.k)
         print("             Good-Luck!              ")
         print("-----------------------------------------")
 
     def print_edges(self):
-        for e in range(self.edges):
+        for e in self.live_edges():
             print("E", e, " : [ ", end="")
-            for v in range(self.vertices):
-                if self.matrix[v][e] == 1:
-                    print(v, end=" ")
+            for v in self.edge(e):
+                print(v, end=" ")
             print("]")
 
     def delete_vertex(self, v):
         # print("delete_vertex ", v)
         if self.v_degree[v] != 0:
-            edges = self.edges_with_v(v)
             self.v_degree[v] = 0
-            for e in edges:
-                self.matrix[v][e] = 0
+            for e in self.v_edges[v]:
+                self.unindex_edge(e)
+                row = self.edge(e)
+                rest = row[row != v]
+                self.e_vertices[e, :len(rest)] = rest
+                self.e_vertices[e, len(rest):] = -1
                 self.e_degree[e] -= 1
+                if self.packed:
+                    self.e_bits[e] &= ~(1 << v)
+                self.index_edge(e)
+                self.changed_edges.add(e)
+            self.v_edges[v] = set()
 
     def delete_edge(self, e):
         # print("delete_edge ", e)
+        # O(d) - e is left as a tombstone, the other edges keep their indices until compact()
+        self.unindex_edge(e)
+        self.changed_edges.discard(e)
         vertices = self.vertices_of_e([e])
-        self.matrix = np.delete(self.matrix, e, 1)
-        self.edges -= 1
-        self.e_degree = np.delete(self.e_degree, [e])
         for v in vertices:
             self.v_degree[v] -= 1
+            self.v_edges[v].discard(e)
+        self.alive[e] = False
+        self.e_vertices[e] = -1
+        self.e_degree[e] = 0
+        if self.packed:
+            self.e_bits[e] = 0
+        self.edges -= 1
+
+    def compact(self):
+        # drop the tombstones of the deleted edges in one pass, the live edges keep their order.
+        # returns remap: remap[old index] = new index, or -1 if the edge was deleted
+        live = np.flatnonzero(self.alive[:self.slots])
+        remap = np.full(self.slots, -1)
+        remap[live] = np.arange(len(live))
+        if len(live) == self.slots:
+            return remap
+        self.e_vertices = self.e_vertices[live]
+        self.e_degree = self.e_degree[live]
+        if self.packed:
+            self.e_bits = [self.e_bits[e] for e in live]
+        self.slots = len(live)
+        self.alive = np.ones(self.slots, bool)
+        for v in range(self.vertices):
+            if len(self.v_edges[v]) > 0:
+                self.v_edges[v] = {int(remap[e]) for e in self.v_edges[v]}
+        for same in self.e_index.values():
+            remapped = [int(remap[e]) for e in same]
+            same.clear()
+            same.update(remapped)
+        self.changed_edges = {int(remap[e]) for e in self.changed_edges}
+        return remap
+
+    def reserve(self, n):
+        # make room for n more edges, growing the capacity at least twofold (amortized O(d) per edge)
+        capacity = self.e_vertices.shape[0]
+        if self.slots + n <= capacity:
+            return
+        capacity = max(2 * capacity, self.slots + n)
+        e_vertices = np.full((capacity, self.d), -1, np.int32)
+        e_vertices[:self.slots] = self.e_vertices[:self.slots]
+        e_degree = np.zeros(capacity, self.e_degree.dtype)
+        e_degree[:self.slots] = self.e_degree[:self.slots]
+        alive = np.zeros(capacity, bool)
+        alive[:self.slots] = self.alive[:self.slots]
+        self.e_vertices = e_vertices
+        self.e_degree = e_degree
+        self.alive = alive
 
     def add_edge(self, e):
+        # e - the vertices of the new edge
         # print("add_edge ", e)
-        self.matrix = np.c_[self.matrix, e]
-        self.e_degree = np.append(self.e_degree, [0])
-        self.edges += 1
-        for i in range(self.vertices):
-            if e[i] == 1:
-                self.v_degree[i] += 1
-                self.e_degree[self.edges - 1] += 1
-
-    def check_v(self, v, e_arr, left_e, k, sol):
-        count = 0
-        new_arr = copy.deepcopy(e_arr)
-        for e in range(self.edges):
-            if (self.matrix[v][e] == 1) and (e_arr[e] == 1):
-                new_arr[e] = 0
-                count += 1
-        left_e -= count
-        sol.append(v)
-        if left_e == 0:
-            return sol
-        if (k-1) == 0:
-            sol.remove(v)
-            return None
-        for new_v in range(v-1, -1, -1):
-            if self.v_degree[new_v] > 0:
-                res = self.check_v(new_v, new_arr, left_e, k-1, sol)
-                if res is not None:
-                    return res
-        left_e += count
-        sol.remove(v)
-        return None
-
-    def solve(self, sol):
+        return self.add_edges([e])[0]
+
+    def add_edges(self, edges):
+        # edges - the vertices of each new edge, returns the indices of the new edges
+        edges = [sorted(set(int(v) for v in e)) for e in edges]
+        for vertices in edges:
+            if len(vertices) > self.d:
+                raise ValueError("edge of size %d is larger than d=%d" % (len(vertices), self.d))
+        self.reserve(len(edges))
+        indices = []
+        for vertices in edges:
+            e = self.slots
+            self.e_vertices[e, :len(vertices)] = vertices
+            self.e_degree[e] = len(vertices)
+            self.alive[e] = True
+            if self.packed:
+                self.e_bits.append(pack(vertices))
+            self.edges += 1
+            self.slots += 1
+            for v in vertices:
+                self.v_degree[v] += 1
+                self.v_edges[v].add(e)
+            self.index_edge(e)
+            self.changed_edges.add(e)
+            indices.append(e)
+        return indices
+
+    def set_edges(self, e_vertices):
+        # replace all the edges at once by the rows of e_vertices (sorted, padded with -1, at most d wide).
+        # the arrays are built in bulk (a d wide int32 array is taken as it is), only the vertex -> edges
+        # sets and the edge index need a pass over the edges
+        e_vertices = np.asarray(e_vertices)
+        (e, width) = e_vertices.shape
+        if width > self.d:
+            raise ValueError("edges of size %d are larger than d=%d" % (width, self.d))
+        if width == self.d:
+            self.e_vertices = np.require(e_vertices, np.int32, ["C", "W"])
+        else:
+            self.e_vertices = np.full((e, self.d), -1, np.int32)
+            self.e_vertices[:, :width] = e_vertices
+        self.e_degree = np.count_nonzero(self.e_vertices >= 0, axis=1).astype(int)
+        self.alive = np.ones(e, bool)
+        self.edges = e
+        self.slots = e
+        flat = self.e_vertices.ravel()
+        real = flat >= 0
+        vertices = flat[real]
+        if len(vertices) > 0 and vertices.max() >= self.vertices:
+            raise ValueError("vertex %d is out of range(%d)" % (vertices.max(), self.vertices))
+        self.v_degree = np.bincount(vertices, minlength=self.vertices)
+        # millions of new sets and tuples - without the cycle collector running again and again on them
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            self.index_all()
+        finally:
+            if collecting:
+                gc.enable()
+
+    def index_all(self):
+        # the vertex -> edges sets, the bitsets and the edge index of all the edges, from the arrays.
+        # the edges of every vertex: the entries sorted by vertex, cut at the cumulative degrees
+        flat = self.e_vertices[:self.slots].ravel()
+        real = flat >= 0
+        edges = np.repeat(np.arange(self.slots), self.d)[real][np.argsort(flat[real], kind="stable")].tolist()
+        ends = np.cumsum(self.v_degree).tolist()
+        starts = [0] + ends[:-1]
+        self.v_edges = [set(edges[a:b]) for (a, b) in zip(starts, ends)]
+        rows = self.e_vertices.tolist()
+        degrees = self.e_degree.tolist()
+        if self.packed:
+            self.e_bits = [pack(row[:n]) for (row, n) in zip(rows, degrees)]
+        self.e_index = {}
+        for (x, row) in enumerate(rows):
+            self.e_index.setdefault(tuple(row[:degrees[x]]), set()).add(x)
+        self.changed_edges = set(range(self.slots))
+
+    def branch(self, order, start, hits, k, sol, memo=None, key=0):
+        # bounded search tree: the first edge of order that is not hit yet must be hit by one of its
+        # ≤ d vertices - try each of them with k-1, so at most d^k nodes.
+        # hits[e] - how many vertices of sol are in e, updated in place and undone on the way back
+        # memo - a TranspositionTable of the states without a solution, key - the key of this state
+        # explicit stack - a frame for every node on the path: [start, k, key, the vertices to try, the next one]
+        stack = []
+        stopped = False  # once stopped the nodes are left unsearched - nothing more goes to memo
+        while True:
+            # a new node
+            while start < len(order) and hits[order[start]] > 0:
+                start += 1
+            if start == len(order):
+                return sol
+            stopped = stopped or (self.stop is not None and self.stop.is_set())
+            if not (k == 0 or stopped or (memo is not None and memo.failed(key, k))):
+                stack.append([start, k, key, self.edge(order[start]).tolist(), 0])
+            # go back up to the first node with a vertex left to try
+            while True:
+                if len(stack) == 0:
+                    return None
+                frame = stack[-1]
+                if frame[4] > 0:
+                    for e in self.v_edges[sol.pop()]:
+                        hits[e] -= 1
+                if frame[4] < len(frame[3]):
+                    break
+                stack.pop()
+                if memo is not None and not stopped:
+                    memo.store(frame[2], frame[1])
+            (start, k, key, vertices, i) = frame
+            frame[4] += 1
+            v = vertices[i]
+            for e in self.v_edges[v]:
+                hits[e] += 1
+                if memo is not None and hits[e] == 1:
+                    key ^= memo.key_of(e)
+            sol.append(v)
+            start += 1
+            k -= 1
+
+    def search_order(self):
+        # the smallest edges first - fewer branches near the root
+        return sorted(self.live_edges(), key=lambda e: self.e_degree[e])
+
+    def solve(self, sol, interleave=False, memo=None, workers=1):
+        # interleave - apply the cheap reduction rules again at every node of the search (Search_Tree)
+        # memo - a Search_Tree.TranspositionTable to prune sub-instances that were already searched
+        # (its keys belong to this instance - use a new table for every instance)
+        # workers - more than 1: split the top of the search tree between processes (Parallel_Search)
         if self.edges == 0 and self.k >= 0:
             return sol
         if self.k <= 0:
             return None
-        for v in range(self.vertices-1, -1, -1):
-            if self.v_degree[v] > 0:
-                res = self.check_v(v, [1]*self.edges, self.edges, self.k, sol)
-                if res is not None:
-                    return res
-        return None
+        if workers > 1:
+            return parallel_solve(self, sol, workers, interleave, memo)
+        if interleave:
+            return SearchTree(self, sol, memo).solve()
+        order = self.search_order()
+        key = 0
+        if memo is not None:
+            for e in order:
+                key ^= memo.key_of(e)
+        return self.branch(order, 0, [0] * self.slots, self.k, sol, memo, key)
 
     def reset_edge(self, e):
+        self.unindex_edge(e)
         vertices = self.vertices_of_e([e])
         for v in vertices:
-            self.matrix[v, e] = 0
+            self.v_edges[v].discard(e)
+        self.e_vertices[e] = -1
         self.e_degree[e] = 0
+        if self.packed:
+            self.e_bits[e] = 0
+        self.index_edge(e)
+        self.changed_edges.add(e)
 
     def delete_edge_2(self, e):
+        self.unindex_edge(e)
         vertices = self.vertices_of_e([e])
         for v in vertices:
-            self.matrix[v, e] = 0
+            self.v_edges[v].discard(e)
             self.v_degree[v] -= 1
+        self.e_vertices[e] = -1
         self.edges -= 1
         self.e_degree[e] = 0
+        if self.packed:
+            self.e_bits[e] = 0
+        self.index_edge(e)
+        self.changed_edges.add(e)
+
+    def remove_duplicates(self, keep_last=False, edges=None):
+        # one sweep over the edge index: of every group of equal edges keep only the first
+        # (or the last) one and delete the rest. returns the number of deleted edges.
+        # edges - only look at the groups of these edges
+        if edges is None:
+            groups = list(self.e_index.values())
+        else:
+            groups = [self.e_index[self.key(e)] for e in edges if self.alive[e]]
+        removed = 0
+        for same in groups:
+            if len(same) > 1:
+                keep = max(same) if keep_last else min(same)
+                for e in sorted(same):
+                    if e != keep:
+                        self.delete_edge(e)
+                        removed += 1
+        return removed
+
+
+"""
+A view of a HittingSet: the edges of mask, without the vertices of core.
+    The sunflower search deletes edges and vertices of a sub-instance on every step, a view does it
+    with a mask and a set instead of a copy of the instance - the instance itself is never changed,
+    and only the degrees (O(v + e)) are kept per view.
+"""
+
+
+class HittingSetView:
+
+    def __init__(self, h, mask):
+        self.h = h
+        self.mask = mask.copy()
+        self.core = set()
+        self.vertices = h.vertices
+        self.slots = h.slots
+        self.edges = int(np.count_nonzero(mask))
+        self.d = h.d
+        self.k = h.k
+        rows = h.e_vertices[:h.slots][mask]
+        self.v_degree = np.bincount(rows[rows >= 0], minlength=h.vertices)
+        self.e_degree = np.where(mask, h.e_degree[:h.slots], 0)
+
+    def live_edges(self):
+        # the edges of the view that were not deleted, in order
+        return np.flatnonzero(self.mask).tolist()
+
+    def edge(self, e):
+        return [v for v in self.h.edge(e).tolist() if v not in self.core]
+
+    def edges_with_v(self, v):
+        if v in self.core:
+            return set()
+        return {e for e in self.h.v_edges[v] if self.mask[e]}
+
+    def delete_edge(self, e):
+        if self.mask[e]:
+            self.mask[e] = False
+            for v in self.edge(e):
+                self.v_degree[v] -= 1
+            self.e_degree[e] = 0
+            self.edges -= 1
+
+    def delete_vertex(self, v):
+        if self.v_degree[v] != 0:
+            self.v_degree[v] = 0
+            for e in self.edges_with_v(v):
+                self.e_degree[e] -= 1
+            self.core.add(v)
 
-    def is_dup(self, e, index):
-        for i in range(index, -1, -1):
-            if sum(np.bitwise_xor(e, self.matrix[:, i])) == 0:
-                self.reset_edge(i)
\ No newline at end of file
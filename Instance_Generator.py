@@ -0,0 +1,119 @@
+import numpy as np
+from Hitting_Set import HittingSet
+
+
+"""
+Random instances:
+    all the edges are drawn in one NumPy call (from a seeded generator, so the same seed gives the same
+    instance) and written into the HittingSet arrays at once - nothing is printed.
+    - uniform: every edge is d different vertices, uniformly.
+    - power_law: vertex i is drawn with probability ∝ (i+1)^(-1/(exponent-1)) (the degrees follow a power law
+      with the given exponent), the vertex names are shuffled.
+    - planted_hitting_set: k vertices that hit every edge (an edge that misses them gets one of them).
+    - planted_sunflowers: sunflowers with k+1 petals (options: sunflowers, core, petals), the rest uniform.
+    - planted_crown: a crown - the vertices I' appear only in the edges h + x, where h is one of the
+      (d − 1)-subedges H' and |I'| > |H'| (options: crown_h, crown_i), the rest uniform without I'.
+    generate returns (h, planted): the planted hitting set, the cores of the sunflowers or the vertices
+    of I' - None for uniform and power_law.
+"""
+
+
+def distinct_rows(rng, v, rows, d, p=None):
+    # rows x d vertices, different in every row, drawn with the probabilities p (uniform if None)
+    if d > v:
+        raise ValueError("edges of size %d need more than %d vertices" % (d, v))
+    if rows == 0 or d == 0:
+        return np.zeros((rows, d), np.int32)
+    if p is None and v < 2 * d:
+        # few vertices - the beginning of a random permutation of all of them
+        return np.argsort(rng.random((rows, v)), axis=1)[:, :d].astype(np.int32)
+    out = rng.choice(v, size=(rows, d), p=p).astype(np.int32)
+    bad = np.arange(rows)
+    for attempt in range(100):
+        s = np.sort(out[bad], axis=1)
+        bad = bad[(s[:, 1:] == s[:, :-1]).any(axis=1)]
+        if len(bad) == 0:
+            return out
+        # draw again only the rows with a vertex twice
+        out[bad] = rng.choice(v, size=(len(bad), d), p=p)
+    for r in bad.tolist():
+        out[r] = rng.choice(v, d, replace=False, p=p)
+    return out
+
+
+def uniform(rng, v, e, d, k, options):
+    return distinct_rows(rng, v, e, d), None
+
+
+def power_law(rng, v, e, d, k, options):
+    exponent = options.get("exponent", 2.5)
+    weights = np.arange(1, v + 1) ** (-1.0 / (exponent - 1))
+    names = rng.permutation(v).astype(np.int32)
+    return names[distinct_rows(rng, v, e, d, weights / weights.sum())], None
+
+
+def planted_hitting_set(rng, v, e, d, k, options):
+    planted = rng.choice(v, k, replace=False).astype(np.int32)
+    rows = distinct_rows(rng, v, e, d)
+    missed = ~np.isin(rows, planted).any(axis=1)
+    rows[missed, 0] = rng.choice(planted, int(missed.sum()))
+    return rows, sorted(planted.tolist())
+
+
+def planted_sunflowers(rng, v, e, d, k, options):
+    count = options.get("sunflowers", 1)
+    size = options.get("core", 1)
+    petals = options.get("petals", k + 1)
+    if count * petals > e:
+        raise ValueError("%d sunflowers with %d petals do not fit in %d edges" % (count, petals, e))
+    if size >= d or v - size < petals * (d - size):
+        raise ValueError("no room for %d petals of size %d around a core of size %d" % (petals, d - size, size))
+    parts = []
+    cores = []
+    for s in range(count):
+        core = rng.choice(v, size, replace=False)
+        rest = np.setdiff1d(np.arange(v), core)
+        petal = rng.choice(rest, petals * (d - size), replace=False).reshape(petals, d - size)
+        parts.append(np.hstack([np.tile(core, (petals, 1)), petal]))
+        cores.append(sorted(core.tolist()))
+    parts.append(distinct_rows(rng, v, e - count * petals, d))
+    rows = np.vstack(parts).astype(np.int32)
+    return rows[rng.permutation(e)], cores
+
+
+def planted_crown(rng, v, e, d, k, options):
+    crown_h = options.get("crown_h", k)
+    crown_i = options.get("crown_i", 2 * crown_h)
+    if d < 2 or crown_i <= crown_h or crown_i > e:
+        raise ValueError("a crown needs d ≥ 2, |I'| > |H'| and |I'| ≤ e")
+    if v - crown_i < d:
+        raise ValueError("no room for the rest of the edges next to %d crown vertices" % crown_i)
+    names = rng.permutation(v).astype(np.int32)
+    i_crown = names[:crown_i]
+    others = names[crown_i:]
+    subedges = others[distinct_rows(rng, len(others), crown_h, d - 1)]
+    # x_j is matched to h_j, the other vertices of I' go to random subedges
+    matched = np.concatenate([np.arange(crown_h), rng.integers(0, crown_h, crown_i - crown_h)])
+    crown = np.hstack([subedges[matched], i_crown[:, None]])
+    rest = others[distinct_rows(rng, len(others), e - crown_i, d)]
+    rows = np.vstack([crown, rest]).astype(np.int32)
+    return rows[rng.permutation(e)], sorted(i_crown.tolist())
+
+
+kinds = {
+    "uniform": uniform,
+    "power_law": power_law,
+    "planted_hitting_set": planted_hitting_set,
+    "planted_sunflowers": planted_sunflowers,
+    "planted_crown": planted_crown,
+}
+
+
+def generate(v, e, d, k, kind="uniform", seed=None, packed=False, **options):
+    if kind not in kinds:
+        raise ValueError("unknown kind %s, one of %s" % (kind, ", ".join(kinds)))
+    rng = np.random.default_rng(seed)
+    (rows, planted) = kinds[kind](rng, v, e, d, k, options)
+    h = HittingSet(v, 0, d, k, packed)
+    h.set_edges(np.sort(rows, axis=1))
+    return h, planted
@@ -0,0 +1,136 @@
+import mmap
+import os
+import zipfile
+import numpy as np
+from Hitting_Set import HittingSet
+
+
+"""
+Instance files:
+    one edge per line - the vertices of the edge separated by spaces (or tabs), empty lines are skipped.
+    Any other character on an edge line (a sign, a decimal point ...) is an error.
+    PACE format: the lines that start with c are comments (after the leading white space), and the header p hs <vertices> <edges>
+    says that the vertices are numbered from 1. Without the header they are numbered from 0
+    (one_based decides if it is given).
+    The file is parsed in bulk with NumPy over a memory map of its bytes: the numbers are the runs of
+    digits, their values are built one digit position at a time for all of them together, and the line
+    of every number (a binary search over the newlines) gives its edge.
+    The parsed edges are cached next to the file (<file>.npz, not compressed) - loading an unchanged
+    file again only reads the arrays back. If the cache cannot be read or written the file is just parsed.
+"""
+
+
+def parse(buf, one_based=None):
+    # buf - the bytes of the file (a uint8 array). returns (the number of vertices, the edge rows padded with -1)
+    newlines = np.flatnonzero(buf == ord("\n"))
+    line_starts = np.concatenate(([0], newlines + 1))
+    line_starts = line_starts[line_starts < len(buf)]
+    line_ends = np.append(newlines, len(buf))[:len(line_starts)]
+    space = (buf == ord(" ")) | (buf == ord("\t")) | (buf == ord("\r")) | (buf == ord("\n"))
+    # the first byte of every line after its leading white space
+    solid = np.append(np.flatnonzero(~space), len(buf))
+    first_pos = solid[np.searchsorted(solid, line_starts)]
+    first = buf[np.minimum(first_pos, len(buf) - 1)]
+    # the comments start with c and the header with p - a line that starts with another letter is an error
+    text = (first_pos < line_ends) & ((first == ord("c")) | (first == ord("p")))
+    vertices = None
+    for start in first_pos[text].tolist():
+        i = np.searchsorted(newlines, start)
+        end = newlines[i] if i < len(newlines) else len(buf)
+        parts = bytes(buf[start:end]).split()
+        if len(parts) >= 3 and parts[0] == b"p" and parts[1] == b"hs":
+            vertices = int(parts[2])
+            if one_based is None:
+                one_based = True
+
+    # the numbers - where a run of digits starts and ends
+    digit = (buf >= ord("0")) & (buf <= ord("9"))
+    wrong = np.flatnonzero(~digit & ~space)
+    wrong = wrong[~text[np.searchsorted(newlines, wrong)]] if len(wrong) > 0 else wrong
+    if len(wrong) > 0:
+        raise ValueError("line %d: %r in an edge" % (np.searchsorted(newlines, wrong[0]) + 1, chr(buf[wrong[0]])))
+    digit = digit.view(np.int8)
+    change = np.diff(np.concatenate((np.zeros(1, np.int8), digit, np.zeros(1, np.int8))))
+    starts = np.flatnonzero(change == 1)
+    ends = np.flatnonzero(change == -1)
+    line = np.searchsorted(newlines, starts)
+    keep = ~text[line] if len(starts) > 0 else np.zeros(0, bool)
+    (starts, ends, line) = (starts[keep], ends[keep], line[keep])
+    lengths = ends - starts
+    values = np.zeros(len(starts), np.int64)
+    for j in range(int(lengths.max()) if len(lengths) > 0 else 0):
+        more = lengths > j
+        values[more] = values[more] * 10 + (buf[starts[more] + j] - ord("0"))
+    if one_based:
+        values -= 1
+        if len(values) > 0 and values.min() < 0:
+            raise ValueError("vertex 0 in a file with the vertices numbered from 1")
+
+    # the edges - the numbers of one line
+    first_number = np.flatnonzero(np.concatenate(([True], line[1:] != line[:-1]))) if len(line) > 0 \
+        else np.zeros(0, np.int64)
+    sizes = np.diff(np.append(first_number, len(values)))
+    width = int(sizes.max()) if len(sizes) > 0 else 0
+    pad = np.iinfo(np.int32).max
+    e_vertices = np.full((len(sizes), width), pad, np.int32)
+    e_vertices[np.repeat(np.arange(len(sizes)), sizes), np.arange(len(values)) - np.repeat(first_number, sizes)] = values
+    e_vertices.sort(axis=1)
+    # a vertex that appears twice in a line is one vertex of the edge
+    twice = e_vertices[:, 1:] == e_vertices[:, :-1]
+    if twice.any():
+        e_vertices[:, 1:][twice] = pad
+        e_vertices.sort(axis=1)
+        width = int(np.count_nonzero(e_vertices != pad, axis=1).max())
+        e_vertices = e_vertices[:, :width]
+    e_vertices[e_vertices == pad] = -1
+
+    top = int(values.max()) + 1 if len(values) > 0 else 0
+    if vertices is None:
+        vertices = top
+    elif top > vertices:
+        raise ValueError("vertex %d is out of range(%d)" % (top - 1, vertices))
+    return vertices, e_vertices
+
+
+def read_edges(path, one_based=None, cache=True):
+    # returns (the number of vertices, the edge rows padded with -1), from the cache if the file did not change
+    stat = os.stat(path)
+    meta = np.array([stat.st_size, stat.st_mtime_ns, -1 if one_based is None else int(one_based)], np.int64)
+    cache_path = path + ".npz"
+    if cache and os.path.exists(cache_path):
+        try:
+            with np.load(cache_path) as data:
+                if np.array_equal(data["meta"], meta):
+                    return int(data["vertices"]), data["e_vertices"]
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            pass  # a cache that cannot be read (or a broken one) - parse the file
+    if stat.st_size == 0:
+        (vertices, e_vertices) = (0, np.zeros((0, 0), np.int32))
+    else:
+        error = None
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            buf = np.frombuffer(mm, np.uint8)
+            try:
+                (vertices, e_vertices) = parse(buf, one_based)
+            except Exception as ex:
+                # the frames of the traceback hold views of the map - it could not be closed
+                error = ex.with_traceback(None)
+            del buf
+        if error is not None:
+            raise error
+    if cache:
+        try:
+            np.savez(cache_path, meta=meta, vertices=vertices, e_vertices=e_vertices)
+        except OSError:
+            pass  # a read-only directory - the file is parsed again next time
+    return vertices, e_vertices
+
+
+def load(path, k, d=None, one_based=None, cache=True, packed=False):
+    # the instance of the file as a HittingSet with parameter k (d - the size of the largest edge by default)
+    (vertices, e_vertices) = read_edges(path, one_based, cache)
+    if d is None:
+        d = e_vertices.shape[1]
+    h = HittingSet(vertices, 0, d, k, packed)
+    h.set_edges(e_vertices)
+    return h
@@ -0,0 +1,102 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from Search_Tree import SearchTree, TranspositionTable
+
+
+"""
+Parallel search:
+    the top levels of the search tree are expanded in the main process (breadth first) until there are
+    tasks_per_worker sub-trees for every worker - a sub-tree is the prefix of vertices chosen on the way.
+    Every worker gets a copy of the instance once and then searches whole sub-trees.
+    Sub-trees are very unbalanced, so there are many more of them than workers and they are handed out
+    one at a time from the pool's queue - a worker that finished a small sub-tree takes the next one.
+    As soon as one sub-tree has a solution the stop event is set: the workers leave their search at the
+    next node and the sub-trees that did not start yet are cancelled.
+"""
+
+# the state of a worker process, set once by init_worker
+worker = {}
+
+
+def init_worker(h, stop, interleave, memo_entries):
+    h.stop = stop
+    worker["h"] = h
+    worker["order"] = h.search_order()
+    worker["interleave"] = interleave
+    # every worker keeps its own table - the failed states are still failed in the other sub-trees
+    worker["memo"] = TranspositionTable(memo_entries) if memo_entries > 0 else None
+
+
+def solve_prefix(prefix):
+    # search the sub-tree below prefix, returns (the solution or None, [hits, misses, evictions] of the table)
+    h = worker["h"]
+    memo = worker["memo"]
+    before = [memo.hits, memo.misses, memo.evictions] if memo is not None else [0, 0, 0]
+    if worker["interleave"]:
+        t = SearchTree(h, [], memo)
+        for v in prefix:
+            t.take(v)
+        result = t.solve()
+    else:
+        hits = [0] * h.slots
+        for v in prefix:
+            for e in h.v_edges[v]:
+                hits[e] += 1
+        key = 0
+        if memo is not None:
+            for e in worker["order"]:
+                if hits[e] == 0:
+                    key ^= memo.key_of(e)
+        result = h.branch(worker["order"], 0, hits, h.k - len(prefix), list(prefix), memo, key)
+    after = [memo.hits, memo.misses, memo.evictions] if memo is not None else [0, 0, 0]
+    return result, [a - b for (a, b) in zip(after, before)]
+
+
+def split(h, order, tasks):
+    # expand the search tree until there are at least tasks prefixes (or the prefixes have k vertices)
+    # returns (a solution found on the way or None, the prefixes)
+    frontier = [[]]
+    for depth in range(h.k):
+        if len(frontier) >= tasks:
+            break
+        next_frontier = []
+        for prefix in frontier:
+            hit = set().union(*[h.v_edges[v] for v in prefix])
+            first = next((e for e in order if e not in hit), None)
+            if first is None:
+                return prefix, []
+            for v in h.edge(first).tolist():
+                next_frontier.append(prefix + [v])
+        frontier = next_frontier
+    return None, frontier
+
+
+def parallel_solve(h, sol, workers, interleave=False, memo=None, tasks_per_worker=4):
+    # memo - only its max_entries (for the table of every worker) and its counters (the sum of the workers)
+    (found, prefixes) = split(h, h.search_order(), workers * tasks_per_worker)
+    if found is not None:
+        sol.extend(found)
+        return sol
+    stop = multiprocessing.Event()
+    memo_entries = memo.max_entries if memo is not None else 0
+    result = None
+    with ProcessPoolExecutor(workers, initializer=init_worker,
+                             initargs=(h, stop, interleave, memo_entries)) as pool:
+        pending = {pool.submit(solve_prefix, prefix) for prefix in prefixes}
+        while len(pending) > 0 and result is None:
+            (done, pending) = wait(pending, return_when=FIRST_COMPLETED)
+            for f in done:
+                (r, counts) = f.result()
+                if memo is not None:
+                    memo.hits += counts[0]
+                    memo.misses += counts[1]
+                    memo.evictions += counts[2]
+                if r is not None and result is None:
+                    result = r
+        stop.set()
+        for f in pending:
+            f.cancel()
+    if result is None:
+        return None
+    sol.extend(result)
+    return sol
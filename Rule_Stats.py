@@ -0,0 +1,80 @@
+import json
+import timeit
+import numpy as np
+
+
+"""
+Rule statistics:
+    the kernels apply every rule through run_rule. Without a RuleStats (stats=None) the rule is just called,
+    with one it is measured - for every rule the number of calls, the wall time, the edges and vertices it
+    removed (the edges it added are counted as negative) and its candidates - what the rule itself
+    examined: the vertices it checked, the changed edges, the subedges over the threshold ... a rule reports
+    them with stats.count while it runs (the counts of a rule called inside another are its own).
+    The high occurrence rule also keeps a record of every level i in levels, and the crown its sizes in crown.
+    With trace=True every call is also kept as an event - write_trace saves them as a Chrome trace
+    (chrome://tracing or Perfetto), where the calls made inside another call are nested under it.
+"""
+
+
+class RuleStats:
+
+    def __init__(self, trace=False):
+        self.rules = {}  # rule -> {"calls", "time", "edges_removed", "vertices_removed", "candidates"}
+        self.levels = []  # the level records of the high occurrence rule
+        self.crown = None  # {"i", "h", "crown"} - |I|, |H| and |I'| of the last crown construction
+        self.events = [] if trace else None
+        self.counts = []  # the candidates of the rules that are running, the innermost last
+        self.start = timeit.default_timer()
+
+    def count(self, n):
+        # n more candidates of the rule that is running
+        if len(self.counts) > 0:
+            self.counts[-1] += n
+
+    def begin(self, h):
+        self.counts.append(0)
+        return timeit.default_timer(), h.edges, int(np.count_nonzero(h.v_degree))
+
+    def end(self, rule, h, mark):
+        now = timeit.default_timer()
+        (start, edges, vertices) = mark
+        candidates = self.counts.pop()
+        record = self.rules.get(rule)
+        if record is None:
+            record = {"calls": 0, "time": 0.0, "edges_removed": 0, "vertices_removed": 0, "candidates": 0}
+            self.rules[rule] = record
+        edges_removed = edges - h.edges
+        vertices_removed = vertices - int(np.count_nonzero(h.v_degree))
+        record["calls"] += 1
+        record["time"] += now - start
+        record["edges_removed"] += edges_removed
+        record["vertices_removed"] += vertices_removed
+        record["candidates"] += candidates
+        if self.events is not None:
+            self.events.append({"name": rule, "ph": "X", "pid": 0, "tid": 0,
+                                "ts": (start - self.start) * 1e6, "dur": (now - start) * 1e6,
+                                "args": {"edges_removed": edges_removed, "vertices_removed": vertices_removed,
+                                         "candidates": candidates}})
+
+    def summary(self):
+        return {"rules": self.rules, "levels": self.levels, "crown": self.crown}
+
+    def write_trace(self, path):
+        with open(path, "w") as f:
+            json.dump({"traceEvents": self.events or [], "displayTimeUnit": "ms"}, f)
+
+    def print_stats(self):
+        print("%-20s %8s %12s %8s %8s %10s" % ("rule", "calls", "time", "edges", "vertices", "candidates"))
+        for rule, r in sorted(self.rules.items(), key=lambda item: -item[1]["time"]):
+            print("%-20s %8d %12.6f %8d %8d %10d" % (rule, r["calls"], r["time"], r["edges_removed"],
+                                                    r["vertices_removed"], r["candidates"]))
+
+
+def run_rule(h, stats, rule, function):
+    # function(h, stats) - measured as rule if stats is given
+    if stats is None:
+        return function(h)
+    mark = stats.begin(h)
+    result = function(h, stats)
+    stats.end(rule, h, mark)
+    return result
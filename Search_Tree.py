@@ -0,0 +1,261 @@
+import random
+from collections import Counter, OrderedDict
+
+
+"""
+Interleaving kernelization with the bounded search tree:
+    at every node of the search tree (after a vertex was added to the solution and k dropped)
+    the cheap reduction rules are applied again on the remaining instance, so the sub-trees shrink.
+    - Singleton: an edge with one vertex left - add the vertex to the solution.
+    - Edge domination: if V({e1}) ⊂ V({e2}) then e2 is hit with e1, drop e2.
+    - Vertex domination: if E(x) ⊆ E(y) then drop x from its edges (includes the degree-1 vertices).
+    - High-degree: more than k edges that pair-wise intersect exactly in {x} - x must be in the solution.
+      (the core is a single vertex, so the rule adds x to the solution rather than a new edge)
+    Rules are only re-checked around the vertices and edges that changed, and every change is written
+    to a trail so it is undone when the search goes back up.
+    The alive edges are kept in buckets by the number of vertices left in them, and the vertices by their
+    degree - the branching edge is taken from the smallest bucket, and when k drops only the vertices of
+    degree > k are checked again, so a node costs what changed and not a scan of the instance.
+"""
+
+"""
+Transposition table:
+    the same remaining instance is reached through different orders of the same choices.
+    A state (the edges that are not hit yet, in Search_Tree also the dropped vertices) that has no
+    solution with k more vertices has none with fewer either, so the table keeps the largest such k.
+    Keys are Zobrist hashes - a random 64-bit number per edge (and vertex), XOR-ed over the state,
+    so a key is updated in O(1) whenever an edge is hit or released.
+    At most max_entries states are kept - the least recently used one is evicted first.
+"""
+
+
+class TranspositionTable:
+
+    def __init__(self, max_entries=100000, seed=0):
+        self.max_entries = max_entries
+        self.table = OrderedDict()  # key -> the largest k that failed
+        self.zobrist = []
+        self.rng = random.Random(seed)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key_of(self, i):
+        # the random number of item i (edge e is item e, vertex v of an instance with s edge slots is s + v)
+        while len(self.zobrist) <= i:
+            self.zobrist.append(self.rng.getrandbits(64))
+        return self.zobrist[i]
+
+    def failed(self, key, k):
+        # was the state already searched with at least k and no solution found?
+        failed_k = self.table.get(key)
+        if failed_k is not None and failed_k >= k:
+            self.table.move_to_end(key)
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def store(self, key, k):
+        self.table[key] = max(k, self.table.get(key, k))
+        self.table.move_to_end(key)
+        if len(self.table) > self.max_entries:
+            self.table.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "entries": len(self.table)}
+
+
+KILL = 0  # the edge is hit (or dominated) and no longer needs to be hit
+EXCLUDE = 1  # the vertex was dropped from its edges
+TAKE = 2  # the vertex was added to the solution
+
+
+class SearchTree:
+
+    def __init__(self, h, sol, memo=None):
+        # memo - a TranspositionTable, or None
+        self.h = h
+        self.memo = memo
+        self.key = 0  # the Zobrist key of the state
+        self.k = h.k
+        self.sol = sol
+        self.alive = [bool(a) for a in h.alive[:h.slots]]  # edges that are not hit yet
+        self.left = h.edges  # number of edges that are not hit yet
+        self.size = [int(x) for x in h.e_degree[:h.slots]]  # vertices left in every edge
+        self.excluded = [False] * h.vertices
+        self.degree = [len(h.v_edges[v]) for v in range(h.vertices)]  # edges not hit yet of every vertex
+        self.buckets = [set() for i in range(h.d + 1)]  # size -> the alive edges with that many vertices left
+        for e in range(len(self.alive)):
+            if self.alive[e]:
+                self.buckets[self.size[e]].add(e)
+        self.by_degree = [set() for i in range(max(self.degree, default=0) + 1)]  # degree -> vertices
+        for v in range(h.vertices):
+            self.by_degree[self.degree[v]].add(v)
+        self.trail = []
+        self.edge_queue = []
+        self.vertex_queue = []
+        if memo is not None:
+            for e in range(len(self.alive)):
+                if self.alive[e]:
+                    self.key ^= memo.key_of(e)
+
+    def vertices_left(self, e):
+        return [v for v in self.h.edge(e).tolist() if not self.excluded[v]]
+
+    def resize(self, e, change):
+        self.buckets[self.size[e]].discard(e)
+        self.size[e] += change
+        self.buckets[self.size[e]].add(e)
+
+    def redegree(self, v, change):
+        self.by_degree[self.degree[v]].discard(v)
+        self.degree[v] += change
+        self.by_degree[self.degree[v]].add(v)
+
+    def kill(self, e):
+        self.alive[e] = False
+        self.buckets[self.size[e]].discard(e)
+        self.left -= 1
+        if self.memo is not None:
+            self.key ^= self.memo.key_of(e)
+        for v in self.vertices_left(e):
+            self.redegree(v, -1)
+            self.vertex_queue.append(v)
+        self.trail.append((KILL, e))
+
+    def exclude(self, v):
+        self.excluded[v] = True
+        if self.memo is not None:
+            self.key ^= self.memo.key_of(len(self.alive) + v)
+        for e in self.h.v_edges[v]:
+            if self.alive[e]:
+                self.resize(e, -1)
+                self.edge_queue.append(e)
+        self.trail.append((EXCLUDE, v))
+
+    def take(self, v):
+        self.sol.append(v)
+        self.k -= 1
+        self.trail.append((TAKE, v))
+        for e in self.h.v_edges[v]:
+            if self.alive[e]:
+                self.kill(e)
+
+    def undo(self, mark):
+        # go back to the state when the trail had mark entries
+        while len(self.trail) > mark:
+            (op, x) = self.trail.pop()
+            if op == KILL:
+                self.alive[x] = True
+                self.buckets[self.size[x]].add(x)
+                self.left += 1
+                if self.memo is not None:
+                    self.key ^= self.memo.key_of(x)
+                for v in self.vertices_left(x):
+                    self.redegree(v, 1)
+            elif op == EXCLUDE:
+                self.excluded[x] = False
+                if self.memo is not None:
+                    self.key ^= self.memo.key_of(len(self.alive) + x)
+                for e in self.h.v_edges[x]:
+                    if self.alive[e]:
+                        self.resize(e, 1)
+            else:
+                self.sol.pop()
+                self.k += 1
+        self.edge_queue = []
+        self.vertex_queue = []
+
+    def check_edge(self, e1):
+        # singleton, or drop the edges that contain e1
+        vertices = self.vertices_left(e1)
+        if len(vertices) == 0:
+            return False
+        if len(vertices) == 1:
+            if self.k == 0:
+                return False
+            self.take(vertices[0])
+            return True
+        for e2 in set.intersection(*[self.h.v_edges[v] for v in vertices]):
+            if (e2 != e1) and self.alive[e2]:
+                self.kill(e2)
+        return True
+
+    def check_vertex(self, x):
+        # vertex domination, then the high-degree rule with the core {x}
+        edges = [e for e in self.h.v_edges[x] if self.alive[e]]
+        count = Counter()
+        for e in edges:
+            count.update(self.vertices_left(e))
+        for y, together in count.items():
+            if (together == self.degree[x]) and (y != x):
+                self.exclude(x)
+                return
+        if 0 < self.k < self.degree[x]:
+            used = set()
+            petals = 0
+            for e in edges:
+                petal = set(self.vertices_left(e))
+                petal.discard(x)
+                if used.isdisjoint(petal):
+                    used.update(petal)
+                    petals += 1
+            if petals > self.k:
+                self.take(x)
+
+    def reduce(self):
+        # apply the rules until none of them applies, False if this node has no solution
+        while len(self.edge_queue) > 0 or len(self.vertex_queue) > 0:
+            if len(self.edge_queue) > 0:
+                e = self.edge_queue.pop()
+                if self.alive[e] and not self.check_edge(e):
+                    return False
+            else:
+                v = self.vertex_queue.pop()
+                if (not self.excluded[v]) and self.degree[v] > 0:
+                    self.check_vertex(v)
+        return self.left == 0 or self.k > 0
+
+    def branch(self):
+        # explicit stack - a frame for every node on the path: [the vertices to try, the next one, the trail mark]
+        stack = []
+        node = True  # False - the rules found that the last choice has no solution
+        stopped = False  # once stopped the nodes are left unsearched - nothing more goes to memo
+        while True:
+            if node and self.left == 0:
+                return True
+            stopped = stopped or (self.h.stop is not None and self.h.stop.is_set())
+            if node and not (stopped or (self.memo is not None and self.memo.failed(self.key, self.k))):
+                # an edge with the fewest vertices left - one of them must be in the solution
+                e = next(iter(next(b for b in self.buckets if len(b) > 0)))
+                stack.append([self.vertices_left(e), 0, len(self.trail)])
+            # go back up to the first node with a vertex left to try
+            while True:
+                if len(stack) == 0:
+                    return False
+                frame = stack[-1]
+                if frame[1] > 0:
+                    self.undo(frame[2])
+                if frame[1] < len(frame[0]):
+                    break
+                stack.pop()
+                if self.memo is not None and not stopped:
+                    self.memo.store(self.key, self.k)
+            v = frame[0][frame[1]]
+            frame[1] += 1
+            self.take(v)
+            # k dropped - the high-degree rule may apply to the vertices of degree > k
+            for bucket in self.by_degree[self.k + 1:]:
+                self.vertex_queue.extend(bucket)
+            node = self.reduce()
+
+    def solve(self):
+        if self.left > 0 and self.k <= 0:
+            return None
+        self.edge_queue = [e for e in range(len(self.alive)) if self.alive[e]]
+        self.vertex_queue = [v for v in range(self.h.vertices) if self.degree[v] > 0]
+        if self.reduce() and self.branch():
+            return self.sol
+        return None
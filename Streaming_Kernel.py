@@ -0,0 +1,191 @@
+from collections import Counter, defaultdict
+from itertools import combinations
+from Hitting_Set import HittingSet
+
+
+"""
+Streaming kernel:
+    edges arrive and leave over time, and the kernel is kept up to date instead of being built again.
+    The rules are the cheap ones of the crown kernel:
+    - Duplicates: the edges are kept by their canonical key, so equal edges are one edge.
+    - Singleton: an edge {x} - x goes to the partial solution, the edges of x are hit.
+    - Edge domination: an edge that contains another edge is dropped.
+    - Vertex domination: if E(x) ⊆ E(y) then x is dropped from its edges.
+    - High-degree: more than k edges whose pair-wise intersection is the same (d − 2)-subedge c -
+      drop them and add c (only for d > 2, the empty core is left to the kernels that see all edges).
+      The threshold is the k of the instance and not k − |A|: a rule that held stays true when
+      another singleton is taken or undone, so the rules of one part never depend on the others.
+    Every applied rule is a record of the small steps it made and the vertices it read.
+    A new or removed edge only undoes the records that read one of its vertices (and the later records
+    that read what those changed), then the rules are checked again around the vertices that changed -
+    the work is proportional to the change, not to the instance.
+"""
+
+PUT = 0  # (PUT, e, n) - n more copies of the edge e
+OUT = 1  # (OUT, e, n) - n copies of the edge e less
+TAKE = 2  # (TAKE, x) - x joins the partial solution
+
+
+class StreamingKernel:
+
+    def __init__(self, v, d, k):
+        self.vertices = v
+        self.d = d
+        self.k = k
+        self.raw = Counter()  # the edges of the instance (sorted vertex tuples) -> multiplicity
+        self.kernel = Counter()  # the edges of the kernel -> number of copies (from the instance or a core)
+        self.v_edges = defaultdict(set)  # vertex -> the kernel edges that contain it
+        self.taken = set()  # the partial solution
+        self.records = {}  # id -> (steps, reads, writes) of every rule that is in effect
+        self.v_records = defaultdict(set)  # vertex -> the ids of the records that read it
+        self.next_id = 0
+        self.dirty = set()  # the vertices to check the rules around
+        self.applied = 0  # rules applied
+        self.undone = 0  # rules undone
+
+    def key(self, e):
+        key = tuple(sorted(set(int(v) for v in e)))
+        if len(key) > self.d:
+            raise ValueError("edge of size %d is larger than d=%d" % (len(key), self.d))
+        if len(key) > 0 and (key[0] < 0 or key[-1] >= self.vertices):
+            raise ValueError("edge %s has a vertex out of range(%d)" % (str(key), self.vertices))
+        return key
+
+    def step(self, s, undo=False):
+        # apply one step of a rule (or undo it)
+        if s[0] == TAKE:
+            if undo:
+                self.taken.discard(s[1])
+            else:
+                self.taken.add(s[1])
+            self.dirty.add(s[1])
+            return
+        (op, e, n) = s
+        if (op == OUT) != undo:
+            self.kernel[e] -= n
+            if self.kernel[e] == 0:
+                del self.kernel[e]
+                for v in e:
+                    self.v_edges[v].discard(e)
+        else:
+            self.kernel[e] += n
+            if self.kernel[e] == n:
+                for v in e:
+                    self.v_edges[v].add(e)
+        self.dirty.update(e)
+
+    def apply(self, steps, reads):
+        # apply a rule and keep it as a record - it reads reads and the vertices it changes
+        writes = set()
+        for s in steps:
+            self.step(s)
+            writes.update(s[1:2] if s[0] == TAKE else s[1])
+        reads = writes.union(reads)
+        rid = self.next_id
+        self.next_id += 1
+        self.records[rid] = (steps, reads, writes)
+        for v in reads:
+            self.v_records[v].add(rid)
+        self.applied += 1
+
+    def invalidate(self, vertices):
+        # undo the records that read one of vertices, and the later records that read what they changed
+        found = set()
+        stack = [r for v in vertices for r in self.v_records[v]]
+        while len(stack) > 0:
+            r = stack.pop()
+            if r not in found:
+                found.add(r)
+                for v in self.records[r][2]:
+                    stack.extend(x for x in self.v_records[v] if x > r)
+        for r in sorted(found, reverse=True):
+            (steps, reads, writes) = self.records.pop(r)
+            for v in reads:
+                self.v_records[v].discard(r)
+            for s in reversed(steps):
+                self.step(s, undo=True)
+            self.undone += 1
+
+    def add_edges(self, edges):
+        for e in edges:
+            key = self.key(e)
+            self.raw[key] += 1
+            if self.raw[key] == 1:
+                self.invalidate(key)
+                self.step((PUT, key, 1))
+
+    def remove_edges(self, edges):
+        for e in edges:
+            key = self.key(e)
+            if self.raw[key] == 0:
+                raise ValueError("edge %s is not in the instance" % str(key))
+            self.raw[key] -= 1
+            if self.raw[key] == 0:
+                del self.raw[key]
+                # every record that changed the edge read its vertices - after this it is back as it came
+                self.invalidate(key)
+                self.step((OUT, key, 1))
+
+    def subset_of(self, e):
+        # an edge of the kernel that e contains properly (the empty edge is not counted), or None
+        count = Counter()
+        for v in e:
+            count.update(self.v_edges[v])
+        for e1, shared in count.items():
+            if (shared == len(e1)) and (len(e1) < len(e)):
+                return e1
+        return None
+
+    def petals(self, c):
+        # greedy: the edges that contain c and pair-wise intersect exactly in c
+        found = []
+        for e in sorted(set.intersection(*[self.v_edges[v] for v in c])):
+            if all(len(set(e).intersection(e2)) == len(c) for e2 in found):
+                found.append(e)
+        return found
+
+    def check(self, v):
+        # apply one rule around v, False if none of them applies
+        edges = sorted(self.v_edges[v], key=len)
+        if len(edges) == 0:
+            return False
+        if (v,) in self.kernel:
+            self.apply([(TAKE, v)] + [(OUT, e, self.kernel[e]) for e in edges], [])
+            return True
+        for e in edges:
+            if self.subset_of(e) is not None:
+                self.apply([(OUT, e, self.kernel[e])], [])
+                return True
+        count = Counter()
+        for e in edges:
+            count.update(e)
+        for y, together in count.items():
+            if (together == len(edges)) and (y != v):
+                steps = []
+                for e in edges:
+                    steps.append((OUT, e, self.kernel[e]))
+                    steps.append((PUT, tuple(u for u in e if u != v), self.kernel[e]))
+                self.apply(steps, [])
+                return True
+        if self.d > 2:
+            for c in sorted({c for e in edges for c in combinations(e, self.d - 2) if v in c}):
+                petals = self.petals(c)
+                if len(petals) > self.k:
+                    self.apply([(OUT, e, self.kernel[e]) for e in petals] + [(PUT, c, 1)], [])
+                    return True
+        return False
+
+    def reduce(self):
+        while len(self.dirty) > 0:
+            self.check(self.dirty.pop())
+
+    def current_kernel(self):
+        # returns (the kernel as a HittingSet, the partial solution) - the partial solution is None
+        # if there is no hitting set of size ≤ k
+        self.reduce()
+        k = self.k - len(self.taken)
+        h = HittingSet(self.vertices, 0, self.d, k)
+        h.add_edges(sorted(self.kernel))
+        if (() in self.kernel) or (k < 0) or (h.edges > 0 and k == 0):
+            return h, None
+        return h, sorted(self.taken)
@@ -1,74 +1,148 @@
-import numpy as np
 import math
-import copy
-
-
-def sunflowerAlgorithm(h):
-
-    for i in range(h.edges - 1, -1, -1):
-        if not (h.e_degree[i] == 0):
-            h.is_dup(h.matrix[:, i], i - 1)
-
-    for i in range(h.edges - 1, -1, -1):
-        if h.e_degree[i] == 0 :  # empty edge or edge.degree < h.d
-            h.delete_edge(i)
-
-    a_kernel = copy.deepcopy(h)
-    for i in range(a_kernel.edges - 1, -1, -1) :
-        if not (a_kernel.e_degree[i]== h.d):   #empty edge or edge.degree < h.d
-            a_kernel.delete_edge_2(i)
-
-
-    if a_kernel.edges < math.factorial(a_kernel.d) * math.pow(a_kernel.k , a_kernel.d):
-        return []
-
-    else :
-        (core, g) = sunflowerAlgorithmRec(a_kernel, np.array([0] * h.vertices), [])
-
-        if sum(core) == 0:
+import numpy as np
+from itertools import combinations
+from Hitting_Set import HittingSetView
+
+
+def sunflowerAlgorithm(h, batch=False, stats=None, linear=False):
+    # batch - in every pass take as many sunflowers as possible (no edge is a petal of two of them)
+    #         and replace all of them before the instance is checked again
+    # stats - if given, a record of every pass is appended to it
+    # linear - use the one pass kernel (sunflowerLinear) instead
+    if linear:
+        return sunflowerLinear(h, stats)
+
+    # every found sunflower is replaced by its core, then the instance is checked again
+    passes = 0
+    while True:
+        h.remove_duplicates(keep_last=True)
+
+        for i in reversed(h.live_edges()):
+            if h.e_degree[i] == 0 :  # empty edge or edge.degree < h.d
+                h.delete_edge(i)
+        h.compact()
+
+        # the edges of size d - a view, h is not copied
+        mask = np.asarray(h.e_degree[:h.slots] == h.d)
+        a_kernel = HittingSetView(h, mask)
+        threshold = math.factorial(a_kernel.d) * math.pow(a_kernel.k , a_kernel.d)
+        found = []
+        no_solution = False
+
+        # more than d!k^d edges - there is a sunflower with k+1 petals
+        while a_kernel.edges > threshold:
+            (core, g) = sunflowerAlgorithmRec(a_kernel, [], [])
+
+            if len(core) == 0:  # k+1 disjoint edges
+                no_solution = True
+                break
+
+            found.append((core, g))
+            if not batch:
+                break
+            # the petals of this sunflower are still in h when the others of this pass are replaced,
+            # so the next sunflower is searched without them
+            mask[g] = False
+            a_kernel = HittingSetView(h, mask)
+
+        passes += 1
+        if stats is not None:
+            stats.append({"pass": passes, "sunflowers": len(found), "edges": h.edges})
+        if no_solution:
             return None
+        if len(found) == 0:
+            return []
 
-        else:
+        for (core, g) in found:
             for i in range(len(g) - 1, -1, -1):
                 h.delete_edge(g[i])
+        for (core, g) in found:
             h.add_edge(core)
-            return sunflowerAlgorithm(h)
 
-        return []
+
+"""
+Linear-time sunflower kernel (van Bevern) for a fixed d:
+    one pass over the edges. For every core C (a proper subset of an edge) we keep the number of
+    petals found so far and the vertices they use - an edge that is disjoint from them outside C is
+    another petal of C.
+    Once C has k+1 petals every hitting set of size ≤ k hits C, so the next edges that contain C
+    are dropped. The kept edges are a subset of C - no new edges - and every edge costs O(2^d * d).
+    If the empty core has k+1 petals there are k+1 disjoint edges - no solution.
+"""
+
+
+def sunflowerLinear(h, stats=None):
+    h.remove_duplicates(keep_last=True)
+    for i in reversed(h.live_edges()):
+        if h.e_degree[i] == 0:  # empty edge
+            h.delete_edge(i)
+
+    petals = {}  # core -> number of petals
+    used = {}  # core -> vertices of its petals
+    full = set()  # cores with k+1 petals
+    dropped = []
+    for e in h.live_edges():
+        edge_e = h.edge(e).tolist()
+        if tuple(edge_e) in full:
+            dropped.append(e)
+            continue
+        cores = [c for size in range(len(edge_e)) for c in combinations(edge_e, size)]
+        if any(c in full for c in cores):
+            dropped.append(e)
+            continue
+        for c in cores:
+            petal = set(edge_e).difference(c)
+            c_used = used.setdefault(c, set())
+            if c_used.isdisjoint(petal):
+                c_used.update(petal)
+                petals[c] = petals.get(c, 0) + 1
+                if petals[c] > h.k:
+                    full.add(c)
+                    del used[c]
+
+    if stats is not None:
+        stats.append({"pass": 1, "sunflowers": len(full), "edges": h.edges})
+    for e in dropped:
+        h.delete_edge(e)
+    h.compact()
+    if () in full:
+        return None
+    return []
 
 
 def sunflowerAlgorithmRec(a_kernel, core, g):
 
-    # build G
-    j = 0
-    while sum(a_kernel.matrix[:, j]) == 0:
-        j = j + 1
-    g = [j]  # first group S1
-    g_vec = a_kernel.matrix[:, j]
-
-    for i in range(1, a_kernel.matrix.shape[1]):
-        if not (a_kernel.e_degree[i] == 0):  # col is not deleted
-            temp = g_vec
-            temp = np.bitwise_and(temp, a_kernel.matrix[:, i])
-            if sum(temp) == 0:  # the group is safe to G
-                g_vec = g_vec + a_kernel.matrix[:, i]
+    # the edges that are not empty, in order - after a vertex joins the core only what is left of them
+    # (its edges) is looked at again
+    edges = [e for e in range(a_kernel.slots) if a_kernel.e_degree[e] != 0]
+    used = bytearray(a_kernel.vertices)  # V(G)
+    while True:
+        if len(edges) == 0:
+            raise IndexError("no edges left for the sunflower")
+        # build G - greedy: an edge joins G if none of its vertices is used yet, O(e*d)
+        g = []
+        for i in edges:
+            edge_i = a_kernel.edge(i)
+            if not any(used[v] for v in edge_i):  # the group is safe to G
+                for v in edge_i:
+                    used[v] = 1
                 g.append(i)
-            else:
-                continue
-
+        for i in g:
+            for v in a_kernel.edge(i):
+                used[v] = 0
 
-    if a_kernel.k <= len(g):  # found sunflower with k-petals
-        return core, g
+        if len(g) > a_kernel.k:  # found sunflower with k+1 petals
+            return core, g
 
-    else:
+        # no sunflower yet - keep the edges of the vertex with max degree, it joins the core
         (v_index, v_edges) = findMaxV(a_kernel)
-        for i in range(a_kernel.edges - 1, -1, -1):
-            if not v_edges.__contains__(i):
-                a_kernel.delete_edge_2(i)
-        core[v_index] = 1
+        for i in a_kernel.live_edges():
+            if i not in v_edges:
+                a_kernel.delete_edge(i)
+        core.append(v_index)
         a_kernel.delete_vertex(v_index)
         a_kernel.d = a_kernel.d - 1  # update d
-        return sunflowerAlgorithmRec(a_kernel, core, g)
+        edges = [e for e in edges if a_kernel.e_degree[e] != 0]
 
 
 def findMaxV(a_kernel):